@@ -1,20 +1,105 @@
+import os
+import threading
 import subprocess
 
-def generate_summary(simulation_text, model="phi3"):
+import requests
+
+from diagnostics import span, timed
+from llm_cache import ResponseCache
+from ollama_client import OllamaClient
+
+# "http" talks to the Ollama server over pooled keep-alive connections;
+# "cli" spawns `ollama run` for every prompt (the original behaviour).
+LLM_BACKEND = os.environ.get("SIMULAD_LLM_BACKEND", "http")
+
+# Set SIMULAD_LLM_CACHE=0 to always query the model.
+LLM_CACHE_ENABLED = os.environ.get("SIMULAD_LLM_CACHE", "1") != "0"
+
+_client = None
+_response_cache = None
+_init_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide OllamaClient, creating it on first use."""
+    global _client
+    with _init_lock:
+        if _client is None:
+            _client = OllamaClient()
+    return _client
+
+def get_response_cache():
+    """Returns the process-wide ResponseCache, or None if caching is disabled."""
+    global _response_cache
+    with _init_lock:
+        if _response_cache is None and LLM_CACHE_ENABLED:
+            _response_cache = ResponseCache()
+    return _response_cache
+
+def build_summary_prompt(simulation_text):
+    """Builds the summarization prompt sent to the model."""
+    return f"Summarize the following simulation results: {simulation_text}"
+
+@timed("llm.cli")
+def _run_cli(prompt, model):
+    result = subprocess.run(
+        ["ollama", "run", model, prompt],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip()
+
+def generate_summary(simulation_text, model="phi3", backend=None, use_cache=True):
     """
     Uses the local AI model (via Ollama) to generate a natural language summary.
     simulation_text: text description of simulation results.
+    backend: "http" or "cli" (defaults to LLM_BACKEND).
+    use_cache: return a cached summary for the same model and (whitespace-normalized) prompt.
+    Errors are returned as text and never cached.
     Returns the AI-generated summary.
     """
-    prompt = f"Summarize the following simulation results: {simulation_text}"
+    prompt = build_summary_prompt(simulation_text)
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(model, prompt)
+        if cached is not None:
+            return cached
     try:
-        result = subprocess.run(
-            ["ollama", "run", model, prompt],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        summary = result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        summary = f"Error generating summary: {e}"
+        if (backend or LLM_BACKEND) == "cli":
+            summary = _run_cli(prompt, model)
+        else:
+            with span("llm.generate", model=model):
+                summary = get_client().generate(model, prompt).strip()
+    except (subprocess.CalledProcessError, OSError, requests.RequestException) as e:
+        return f"Error generating summary: {e}"
+    if cache is not None:
+        cache.put(model, prompt, summary)
     return summary
+
+def stream_summary(simulation_text, model="phi3", backend=None, use_cache=True):
+    """
+    Like generate_summary, but yields the summary in chunks as the model produces them,
+    e.g. for st.write_stream. Cached summaries and the "cli" backend yield the whole summary at once.
+    """
+    if (backend or LLM_BACKEND) == "cli":
+        yield generate_summary(simulation_text, model=model, backend="cli", use_cache=use_cache)
+        return
+    prompt = build_summary_prompt(simulation_text)
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(model, prompt)
+        if cached is not None:
+            yield cached
+            return
+    chunks = []
+    try:
+        # The span includes the time the consumer spends rendering chunks.
+        with span("llm.stream", model=model):
+            for chunk in get_client().stream(model, prompt):
+                chunks.append(chunk)
+                yield chunk
+    except requests.RequestException as e:
+        yield f"Error generating summary: {e}"
+        return
+    if cache is not None:
+        cache.put(model, prompt, "".join(chunks).strip())
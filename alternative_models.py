@@ -1,36 +1,174 @@
 # alternative_models.py
 import pandas as pd
-from statsmodels.tsa.arima.model import ARIMA
-from prophet import Prophet
 
-def forecast_arima(data, order=(1,1,1), steps=24):
+from diagnostics import span, timed
+from model_cache import data_fingerprint, make_key
+from parallel import run_bounded, worker_cache
+
+# statsmodels and Prophet take about a second to import, so they are imported by the
+# fitting functions on first use rather than with this module.
+
+def select_series(data, column=None):
+    """
+    Returns one measurement series of a simulation frame, indexed by DateTime.
+    column: the sensor column to use; defaults to the first measurement column.
+    """
+    indexed = data.set_index("DateTime").drop(columns=["Location"], errors="ignore")
+    if column is None:
+        if indexed.shape[1] == 0:
+            raise ValueError("No measurement column to forecast")
+        return indexed.iloc[:, 0]
+    return indexed[column]
+
+def future_times(times, steps):
+    """Returns the next `steps` timestamps after times, continuing its median time step."""
+    times = pd.Series(times)
+    spacing = times.diff().median()
+    return pd.DatetimeIndex([times.iloc[-1] + spacing * (i + 1) for i in range(steps)])
+
+def horizon_steps(data, hours=24):
+    """Returns the number of data steps covering the next `hours` at the data's median time step (at least 1)."""
+    spacing = data["DateTime"].diff().median()
+    if pd.isna(spacing) or spacing <= pd.Timedelta(0):
+        return hours
+    return max(1, int(round(pd.Timedelta(hours=hours) / spacing)))
+
+def fit_arima(ts, order=(1,1,1), cache=None, location=None):
+    """
+    Fits an ARIMA model to a series indexed by DateTime.
+    cache: optional ModelCache; the fitted model is reused when location, column,
+    order and the training data are unchanged.
+    """
+    key = model_fit = None
+    if cache is not None:
+        key = make_key(location, ts.name, "arima", {"order": list(order)}, data_fingerprint(ts))
+        model_fit = cache.get(key)
+    if model_fit is None:
+        from statsmodels.tsa.arima.model import ARIMA
+        with span("arima.fit", location=location, column=ts.name, rows=len(ts)):
+            model = ARIMA(ts, order=order)
+            model_fit = model.fit()
+        if cache is not None:
+            cache.put(key, model_fit)
+    return model_fit
+
+def fit_prophet(ts, cache=None, location=None, column=None):
     """
-    Trains an ARIMA model on a univariate time series (assumes the second column is the measurement)
-    and forecasts the next 'steps' hours.
+    Fits a Prophet model to a DataFrame with 'ds' and 'y' columns (column names the sensor).
+    cache: optional ModelCache; the fitted model is reused when location, column
+    and the training data are unchanged. Models are cached in Prophet's JSON format.
     """
-    ts = data.set_index("DateTime").iloc[:, 1]
+    from prophet import Prophet
+    from prophet.serialize import model_from_json, model_to_json
+    key = m = None
+    if cache is not None:
+        key = make_key(location, column, "prophet", {}, data_fingerprint(ts))
+        cached = cache.get(key)
+        if cached is not None:
+            m = model_from_json(cached)
+    if m is None:
+        with span("prophet.fit", location=location, column=column, rows=len(ts)):
+            m = Prophet()
+            m.fit(ts)
+        if cache is not None:
+            cache.put(key, model_to_json(m))
+    return m
+
+def forecast_arima(data, order=(1,1,1), steps=24, cache=None, location=None, column=None):
+    """
+    Trains an ARIMA model on a univariate time series (the given column, or the first measurement column)
+    and forecasts the next 'steps' data steps, timestamped at the data's time step (see future_times).
+    cache: optional ModelCache (see fit_arima).
+    """
+    ts = select_series(data, column)
     if len(ts) < 2:
         raise ValueError("Not enough data for ARIMA forecasting")
-    model = ARIMA(ts, order=order)
-    model_fit = model.fit()
-    forecast = model_fit.forecast(steps=steps)
+    model_fit = fit_arima(ts, order=order, cache=cache, location=location)
+    with span("arima.forecast", location=location, column=ts.name):
+        forecast = model_fit.forecast(steps=steps)
     forecast_df = forecast.to_frame(name=ts.name)
-    forecast_df.index = pd.date_range(start=data["DateTime"].iloc[-1], periods=steps+1, freq='H')[1:]
+    forecast_df.index = future_times(data["DateTime"], steps)
     return forecast_df
 
-def forecast_prophet(data, steps=24):
+def forecast_prophet(data, steps=24, cache=None, location=None, column=None):
     """
-    Trains a Prophet model on a univariate time series and forecasts the next 'steps' hours.
+    Trains a Prophet model on a univariate time series (the given column, or the first measurement column)
+    and forecasts the next 'steps' data steps, at the same timestamps as forecast_arima.
     Prophet expects a DataFrame with columns 'ds' (datetime) and 'y' (measurement).
+    cache: optional ModelCache (see fit_prophet).
     """
-    ts = data.set_index("DateTime").iloc[:, 1].reset_index()
+    ts = select_series(data, column).reset_index()
+    column = ts.columns[1]
     ts.rename(columns={"DateTime": "ds", ts.columns[1]: "y"}, inplace=True)
     if ts["y"].dropna().shape[0] < 2:
         raise ValueError("Not enough non-NaN data for Prophet forecasting")
-    m = Prophet()
-    m.fit(ts)
-    future = m.make_future_dataframe(periods=steps, freq='H')
-    forecast = m.predict(future)
+    m = fit_prophet(ts, cache=cache, location=location, column=column)
+    # Only the future rows are needed, so skip predicting over the training history.
+    with span("prophet.predict", location=location, column=column):
+        forecast = m.predict(pd.DataFrame({"ds": future_times(data["DateTime"], steps)}))
     forecast_df = forecast[["ds", "yhat"]].tail(steps)
     forecast_df.set_index("ds", inplace=True)
     return forecast_df
+
+def _forecast_series_task(location, series, model, steps, order, cache_dir):
+    """
+    Forecasts one series inside a batch worker.
+    Returns a tidy DataFrame (Location, Sensor, DateTime, Forecast) or the error message.
+    """
+    return _forecast_series(location, series, model, steps, order, worker_cache(cache_dir))
+
+def _forecast_series(location, series, model, steps, order, cache):
+    data = series.reset_index()
+    try:
+        if model == "arima":
+            forecast_df = forecast_arima(data, order=order, steps=steps, cache=cache, location=location)
+        elif model == "prophet":
+            forecast_df = forecast_prophet(data, steps=steps, cache=cache, location=location)
+        else:
+            raise ValueError(f"Unknown forecast model: {model}")
+    except Exception as e:
+        return str(e)
+    return pd.DataFrame({
+        "Location": location,
+        "Sensor": series.name,
+        "DateTime": forecast_df.index,
+        "Forecast": forecast_df.iloc[:, 0].to_numpy(),
+    })
+
+@timed("forecast.batch")
+def forecast_batch(frames, model="arima", steps=24, order=(1,1,1), columns=None,
+                   workers=1, max_pending=None, cache=None):
+    """
+    Forecasts every sensor column of one or more locations.
+    frames: dict mapping location to its simulation-ready frame (DateTime plus sensor columns).
+    model: "arima" or "prophet".
+    columns: optional list of sensor columns to restrict the batch to.
+    workers: number of processes fitting series in parallel (1 runs serially, None uses all CPUs).
+    max_pending: maximum number of series queued in the pool at once (default 2 * workers),
+      which bounds the memory held by pending tasks; each task only carries its own series.
+    cache: optional ModelCache; workers share its disk tier.
+    Returns one tidy DataFrame with Location, Sensor, DateTime and Forecast columns, in input order.
+    Series that fail to forecast are skipped and listed in the result's attrs["errors"].
+    Spans recorded inside worker processes stay in those processes; the batch is timed as a whole.
+    """
+    tasks = []
+    for location, data in frames.items():
+        indexed = data.set_index("DateTime").drop(columns=["Location"], errors="ignore")
+        for column in indexed.columns:
+            if columns is None or column in columns:
+                tasks.append((location, indexed[column]))
+    
+    if workers == 1 or len(tasks) <= 1:
+        results = [_forecast_series(location, series, model, steps, order, cache) for location, series in tasks]
+    else:
+        cache_dir = cache.cache_dir if cache is not None else None
+        results = run_bounded(_forecast_series_task,
+                              [(location, series, model, steps, order, cache_dir) for location, series in tasks],
+                              workers=workers, max_pending=max_pending)
+    
+    frames_out = [r for r in results if isinstance(r, pd.DataFrame)]
+    errors = {(loc, series.name): r for (loc, series), r in zip(tasks, results) if isinstance(r, str)}
+    forecasts = (pd.concat(frames_out, ignore_index=True) if frames_out
+                 else pd.DataFrame(columns=["Location", "Sensor", "DateTime", "Forecast"]))
+    forecasts.attrs["errors"] = errors
+    return forecasts
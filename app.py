@@ -1,25 +1,112 @@
 # app.py
+import sys
+import time
+# The first run in a fresh server process also pays for importing the app's modules (cold start).
+script_start = time.perf_counter()
+cold_start = "data_access" not in sys.modules
+
 import streamlit as st
 st.set_page_config(page_title="SimuLad", layout="wide", page_icon="🌱")
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
-from alternative_models import forecast_arima, forecast_prophet
-from ai_integration import generate_summary
-from experts import add_expert_message, generate_expert_response, get_conversation_log
+import os
+import uuid
+# Modeling modules import statsmodels/Prophet on first fit; the LLM and streaming backends
+# are imported by the pages and buttons that use them.
+from alternative_models import forecast_arima, forecast_batch, forecast_prophet, horizon_steps
+from conversation_store import ConversationStore
+from storage import DEFAULT_STORE_DIR
+from data_access import SensorDataIndex, count_gaps
+from model_cache import ModelCache
+from var_registry import VARRegistry
+from backtesting import backtest, ensemble_forecast, score_models
+from downsampling import downsample_for_chart
+from diagnostics import (export_from_env, get_spans, get_totals, profile_report, record_span, set_run, span,
+                         start_profile, summarize, to_jsonl, to_prometheus)
+record_span("app.imports", time.perf_counter() - script_start, cold=cold_start)
 
 st.title("SimuLad")
 
+# --- Diagnostics ---
+# Spans recorded during this rerun are tagged with its id and listed in the sidebar's Diagnostics section.
+run_id = uuid.uuid4().hex
+set_run(run_id)
+stale_profiler = st.session_state.pop("active_profiler", None)
+if stale_profiler is not None:
+    # The previous rerun stopped before rendering its profile; do not leave the profiler running.
+    stale_profiler.disable()
+profiler = start_profile() if st.session_state.get("profile_rerun") else None
+if profiler is not None:
+    st.session_state["active_profiler"] = profiler
+
 # --- Load Data ---
-@st.cache_data
-def load_merged_data(filepath="merged_data.csv"):
-    data = pd.read_csv(filepath, parse_dates=["DateTime"])
-    return data
+# Data is read per location from the Parquet store written by data-processing.py.
+# The index is shared by all sessions: each location is loaded and prepared once,
+# so reruns only look frames up instead of filtering and interpolating again.
+@st.cache_resource
+def get_data_index(store_dir=DEFAULT_STORE_DIR):
+    return SensorDataIndex(store_dir)
+
+# Live readings tailed from the raw files (or a drop directory set with SIMULAD_STREAM_DIR),
+# shared by all sessions; the ingest thread starts when the Live Monitor page is first opened.
+@st.cache_resource
+def get_stream_ingestor(watch_dir=os.environ.get("SIMULAD_STREAM_DIR", "data")):
+    from streaming import StreamIngestor
+    return StreamIngestor(watch_dir).start()
+
+# Fitted forecast models, shared by all sessions and persisted across restarts.
+@st.cache_resource
+def get_model_cache():
+    return ModelCache()
+
+# Every model forecasts this many hours ahead, in steps of the data's time step (see horizon_steps).
+FORECAST_HOURS = 24
 
-merged_data = load_merged_data()
+# Fitted VAR models (lag order and level/differenced choice), reused across backtest folds and reruns.
+@st.cache_resource
+def get_var_registry():
+    return VARRegistry()
+
+# Backtest scores per location, sensor and data version; the fits themselves come from the shared caches.
+@st.cache_data(show_spinner="Backtesting ARIMA, Prophet and VAR...")
+def load_backtest_scores(location, sensor, horizon, n_folds, workers, data_version):
+    folds = backtest({location: data_index.prepared(location).data}, columns=[sensor], horizon=horizon,
+                     n_folds=n_folds, workers=workers, cache=model_cache, registry=get_var_registry())
+    return score_models(folds), folds.attrs["errors"]
+
+def forecast_ensemble(location, data, n_folds=3, workers=1):
+    """
+    Backtests ARIMA, Prophet and VAR on a location's first sensor over the forecast horizon and returns
+    (ensemble forecast, backtest scores), the ensemble being weighted by inverse backtest MAE.
+    """
+    sensor = data.columns[1]
+    steps = horizon_steps(data, FORECAST_HOURS)
+    data_version = f"{len(data)}:{data['DateTime'].iloc[-1]}"
+    scores, errors = load_backtest_scores(location, sensor, steps, n_folds, workers, data_version)
+    for (_, _, model, cutoff), error in errors.items():
+        st.warning(f"{model} backtest fold at {cutoff} failed: {error}")
+    if scores.empty:
+        raise ValueError("No model could be backtested")
+    forecast = ensemble_forecast(data, scores.set_index("Model")["Weight"].to_dict(), sensor, steps=steps,
+                                 cache=model_cache, registry=get_var_registry(), location=location)
+    for model, error in forecast.attrs["errors"].items():
+        st.warning(f"{model} left out of the ensemble: {error}")
+    return forecast, scores
+
+data_index = get_data_index()
+model_cache = get_model_cache()
+with span("app.locations"):
+    locations = data_index.locations()
+if not locations:
+    st.error(f"No merged data found in '{DEFAULT_STORE_DIR}'. Run data-processing.py first.")
+    st.stop()
 
 # Sidebar: Page selection
-page = st.sidebar.radio("Select Page", ["Visualizations", "Forecasting", "Expert Collaboration"])
+page = st.sidebar.radio("Select Page", ["Visualizations", "Forecasting", "Expert Collaboration", "Live Monitor"])
+# Seconds until the page reruns itself (set by the Live Monitor page).
+auto_refresh = None
 
 # --------------------------
 # FORECASTING PAGE
@@ -30,80 +117,101 @@ if page == "Forecasting":
     forecast_type = st.sidebar.radio("Forecast Type", ["Single Ecosystem", "Compare Ecosystems"])
     
     st.sidebar.subheader("Forecast Model")
-    forecast_model = st.sidebar.selectbox("Select Forecast Model", ["ARIMA", "Prophet"])
+    forecast_model = st.sidebar.selectbox("Select Forecast Model", ["ARIMA", "Prophet", "Ensemble"])
+    if forecast_model == "Ensemble":
+        # Ensemble weights come from rolling-origin backtests over the most recent history.
+        backtest_folds = st.sidebar.number_input("Backtest Folds", min_value=1, max_value=10, value=3)
+        backtest_workers = st.sidebar.number_input("Backtest Workers", min_value=1, max_value=os.cpu_count() or 1, value=1)
     st.sidebar.subheader("Simulation Settings")
     temp_adjust = st.sidebar.slider("Temperature Change (°F)", -5.0, 5.0, 0.0, 0.5)
     wind_adjust = st.sidebar.slider("Wind Speed Change (m/s)", -5.0, 5.0, 0.0, 0.5)
     run_simulation = st.sidebar.button("Run Simulation")
     
     if forecast_type == "Single Ecosystem":
-        selected_ecosystem = st.sidebar.selectbox("Select Ecosystem", merged_data["Location"].unique().tolist())
-        df_ecosystem = merged_data[merged_data["Location"] == selected_ecosystem]
-        sensor_cols = [col for col in df_ecosystem.columns if col not in ["DateTime", "Location"]]
+        selected_ecosystem = st.sidebar.selectbox("Select Ecosystem", locations)
+        forecast_all = st.sidebar.checkbox("Forecast All Sensors", value=False) if forecast_model != "Ensemble" else False
+        forecast_workers = st.sidebar.number_input("Forecast Workers", min_value=1, max_value=os.cpu_count() or 1, value=1) if forecast_all else 1
+        with span("app.load_frame", location=selected_ecosystem):
+            df_sim = data_index.frame(selected_ecosystem)
+        sensor_cols = data_index.sensor_columns(selected_ecosystem)
         if not sensor_cols:
             st.error(f"No sensor data found for {selected_ecosystem}.")
         else:
-            df_sim = df_ecosystem[["DateTime", "Location"] + sensor_cols]
             st.write(f"Data Preview for {selected_ecosystem}:", df_sim.head())
-            # Prepare simulation data: interpolate missing sensor values.
-            raw_simulation_data = df_sim[["DateTime"] + sensor_cols]
-            simulation_data = raw_simulation_data.copy()
-            simulation_data = simulation_data.set_index("DateTime")
-            simulation_data[sensor_cols] = simulation_data[sensor_cols].interpolate(method='time').ffill().bfill()
-            simulation_data = simulation_data.reset_index()
+            # Simulation data: sensor values with gaps interpolated (cached per location).
+            with span("app.prepare", location=selected_ecosystem):
+                prepared = data_index.prepared(selected_ecosystem)
+            simulation_data = prepared.data
             st.write("Simulation data shape after interpolation:", simulation_data.shape)
+            st.write("Interpolated cells:", count_gaps(prepared.gap_mask))
             
             if simulation_data.shape[0] < 5:
                 st.error("Not enough data available for forecasting. Please check your dataset.")
             else:
                 forecast_df = None
                 if run_simulation:
-                    if forecast_model == "ARIMA":
+                    if forecast_model == "Ensemble":
+                        st.info("Forecasting with a backtest-weighted ensemble of ARIMA, Prophet and VAR...")
+                        try:
+                            forecast_df, scores = forecast_ensemble(selected_ecosystem, simulation_data,
+                                                                    backtest_folds, backtest_workers)
+                            st.subheader("Backtest Scores")
+                            st.dataframe(scores.drop(columns=["Location"]).round(3), hide_index=True)
+                        except Exception as e:
+                            st.error(f"Ensemble forecast failed: {e}")
+                    elif forecast_all:
+                        st.info(f"Forecasting all {len(sensor_cols)} sensors with {forecast_model} model...")
+                        batch = forecast_batch({selected_ecosystem: simulation_data}, model=forecast_model.lower(),
+                                               steps=horizon_steps(simulation_data, FORECAST_HOURS),
+                                               workers=forecast_workers, cache=model_cache)
+                        for (_, sensor), error in batch.attrs["errors"].items():
+                            st.warning(f"{forecast_model} forecast failed for {sensor}: {error}")
+                        if not batch.empty:
+                            forecast_df = batch.pivot(index="DateTime", columns="Sensor", values="Forecast")
+                    elif forecast_model == "ARIMA":
                         st.info("Forecasting with ARIMA model...")
                         try:
-                            forecast_df = forecast_arima(simulation_data, order=(1,1,1), steps=24)
+                            forecast_df = forecast_arima(simulation_data, order=(1,1,1), steps=horizon_steps(simulation_data, FORECAST_HOURS), cache=model_cache, location=selected_ecosystem)
                         except Exception as e:
                             st.error(f"ARIMA forecast failed: {e}")
                     elif forecast_model == "Prophet":
                         st.info("Forecasting with Prophet model...")
                         try:
-                            forecast_df = forecast_prophet(simulation_data, steps=24)
+                            forecast_df = forecast_prophet(simulation_data, steps=horizon_steps(simulation_data, FORECAST_HOURS), cache=model_cache, location=selected_ecosystem)
                         except Exception as e:
                             st.error(f"Prophet forecast failed: {e}")
                     if forecast_df is not None:
-                        st.subheader("Forecast for Next 24 Hours")
-                        st.line_chart(forecast_df)
+                        st.subheader(f"Forecast for Next {FORECAST_HOURS} Hours")
+                        with span("app.chart"):
+                            st.line_chart(forecast_df)
                         simulation_text = (f"In {selected_ecosystem}, Temperature adjusted by {temp_adjust}°F and Wind Speed by {wind_adjust} m/s. "
                                            f"Forecast using {forecast_model} shows the impact on related variables.")
-                        summary = generate_summary(simulation_text)
                         st.subheader("AI-Generated Simulation Summary")
-                        st.write(summary)
+                        from ai_integration import stream_summary
+                        summary = st.write_stream(stream_summary(simulation_text))
                         
     elif forecast_type == "Compare Ecosystems":
         st.subheader("Compare Forecasts for Two Ecosystems")
-        ecos = merged_data["Location"].unique().tolist()
+        ecos = locations
         ecosystem1 = st.sidebar.selectbox("Select Ecosystem 1", ecos, key="eco1")
         ecosystem2 = st.sidebar.selectbox("Select Ecosystem 2", ecos, key="eco2")
         if ecosystem1 == ecosystem2:
             st.error("Please select two different ecosystems for comparison.")
         else:
             # Prepare data for each ecosystem.
-            df1 = merged_data[merged_data["Location"] == ecosystem1]
-            df2 = merged_data[merged_data["Location"] == ecosystem2]
-            sensor_cols1 = [col for col in df1.columns if col not in ["DateTime", "Location"]]
-            sensor_cols2 = [col for col in df2.columns if col not in ["DateTime", "Location"]]
+            df1 = data_index.frame(ecosystem1)
+            df2 = data_index.frame(ecosystem2)
+            sensor_cols1 = data_index.sensor_columns(ecosystem1)
+            sensor_cols2 = data_index.sensor_columns(ecosystem2)
             if not sensor_cols1 or not sensor_cols2:
                 st.error("One or both ecosystems lack sensor data.")
             else:
                 st.write(f"Data Preview for {ecosystem1}:", df1.head())
                 st.write(f"Data Preview for {ecosystem2}:", df2.head())
-                def prepare_data(df, sensors):
-                    raw = df[["DateTime"] + sensors]
-                    sim = raw.copy().set_index("DateTime")
-                    sim[sensors] = sim[sensors].interpolate(method='time').ffill().bfill()
-                    return sim.reset_index()
-                sim1 = prepare_data(df1, sensor_cols1)
-                sim2 = prepare_data(df2, sensor_cols2)
+                with span("app.prepare", location=ecosystem1):
+                    sim1 = data_index.prepared(ecosystem1).data
+                with span("app.prepare", location=ecosystem2):
+                    sim2 = data_index.prepared(ecosystem2).data
                 st.write(f"Simulation data shape for {ecosystem1}: {sim1.shape}")
                 st.write(f"Simulation data shape for {ecosystem2}: {sim2.shape}")
                 if sim1.shape[0] < 5 or sim2.shape[0] < 5:
@@ -114,19 +222,26 @@ if page == "Forecasting":
                         if forecast_model == "ARIMA":
                             st.info("Forecasting with ARIMA model for both ecosystems...")
                             try:
-                                forecast1 = forecast_arima(sim1, order=(1,1,1), steps=24)
-                                forecast2 = forecast_arima(sim2, order=(1,1,1), steps=24)
+                                forecast1 = forecast_arima(sim1, order=(1,1,1), steps=horizon_steps(sim1, FORECAST_HOURS), cache=model_cache, location=ecosystem1)
+                                forecast2 = forecast_arima(sim2, order=(1,1,1), steps=horizon_steps(sim2, FORECAST_HOURS), cache=model_cache, location=ecosystem2)
                             except Exception as e:
                                 st.error(f"ARIMA forecast failed: {e}")
                         elif forecast_model == "Prophet":
                             st.info("Forecasting with Prophet model for both ecosystems...")
                             try:
-                                forecast1 = forecast_prophet(sim1, steps=24)
-                                forecast2 = forecast_prophet(sim2, steps=24)
+                                forecast1 = forecast_prophet(sim1, steps=horizon_steps(sim1, FORECAST_HOURS), cache=model_cache, location=ecosystem1)
+                                forecast2 = forecast_prophet(sim2, steps=horizon_steps(sim2, FORECAST_HOURS), cache=model_cache, location=ecosystem2)
                             except Exception as e:
                                 st.error(f"Prophet forecast failed: {e}")
+                        elif forecast_model == "Ensemble":
+                            st.info("Forecasting with a backtest-weighted ensemble for both ecosystems...")
+                            try:
+                                forecast1, _ = forecast_ensemble(ecosystem1, sim1, backtest_folds, backtest_workers)
+                                forecast2, _ = forecast_ensemble(ecosystem2, sim2, backtest_folds, backtest_workers)
+                            except Exception as e:
+                                st.error(f"Ensemble forecast failed: {e}")
                         if forecast1 is not None and forecast2 is not None:
-                            st.subheader("Forecast for Next 24 Hours")
+                            st.subheader(f"Forecast for Next {FORECAST_HOURS} Hours")
                             col1, col2 = st.columns(2)
                             with col1:
                                 st.markdown(f"**Forecast for {ecosystem1}**")
@@ -142,45 +257,49 @@ if page == "Forecasting":
                                 "Provide a detailed comparison analysis highlighting key differences, potential causes, "
                                 "and actionable recommendations based on these forecasts."
                             )
-                            comparison = generate_summary(compare_prompt)
                             st.subheader("LLM Comparison of Forecasts")
-                            st.write(comparison)
+                            from ai_integration import stream_summary
+                            comparison = st.write_stream(stream_summary(compare_prompt))
 
 # --------------------------
 # EXPERT COLLABORATION PAGE
 # --------------------------
 elif page == "Expert Collaboration":
+    from experts import DEFAULT_MAX_CONCURRENCY, EXPERT_PANEL, stream_expert_discussion
     st.header("Expert Collaboration (AI Experts)")
     st.markdown("Simulated expert discussion among AI specialists analyzing the current ecosystem data.")
     expert_model = st.sidebar.selectbox("Select Expert Model", ["gemma3", "deepseek-r1", "llama3.3", "mistral", "phi3"])
     # Do not display any raw data summary.
     data_summary_input = ""
-    log = get_conversation_log()
-    if log:
-        for entry in log:
-            st.markdown(f"**{entry['timestamp']} - {entry['expert']}**: {entry['message']}")
-    else:
-        st.info("No expert messages yet.")
+    # Each browser session gets its own bounded, persistent log.
+    if "conversation_store" not in st.session_state:
+        st.session_state["conversation_store"] = ConversationStore(session_id=uuid.uuid4().hex)
+    store = st.session_state["conversation_store"]
+    max_concurrency = st.sidebar.slider("Concurrent Experts", 1, len(EXPERT_PANEL), min(DEFAULT_MAX_CONCURRENCY, len(EXPERT_PANEL)))
     if st.button("Generate Expert Discussion"):
-        add_expert_message("Temperature Expert", "Based on the latest sensor data, I observe a subtle upward trend in temperature.")
-        context_temp = ("Temperature Expert: I observe a subtle upward trend in temperature that could affect other variables. "
-                        "Please provide an in-depth analysis of the potential impacts on the ecosystem.")
-        generate_expert_response("Temperature Expert", context_temp, data_summary=data_summary_input, model_choice=expert_model)
-        
-        add_expert_message("Humidity Expert", "Based on the temperature trends, I expect corresponding changes in humidity levels.")
-        context_humidity = ("Humidity Expert: Considering the observed temperature trends and their potential influence on moisture, "
-                            "please analyze how humidity levels might change and suggest actionable recommendations.")
-        generate_expert_response("Humidity Expert", context_humidity, data_summary=data_summary_input, model_choice=expert_model)
-        
-        add_expert_message("Wind Speed Expert", "Observations indicate fluctuations in wind speed which may affect dispersion patterns.")
-        context_wind = ("Wind Speed Expert: Given the variability in wind speed from the dataset, please evaluate how these fluctuations "
-                        "might influence overall ecosystem dynamics, particularly pollutant dispersion or microclimate effects.")
-        generate_expert_response("Wind Speed Expert", context_wind, data_summary=data_summary_input, model_choice=expert_model)
-        
+        # Expert prompts run concurrently; each response streams into its own placeholder.
+        placeholders = [st.empty() for _ in EXPERT_PANEL]
+        partial = [""] * len(EXPERT_PANEL)
+        with span("app.expert_discussion", model=expert_model):
+            for index, chunk in stream_expert_discussion(EXPERT_PANEL, data_summary=data_summary_input,
+                                                         model_choice=expert_model, max_concurrency=max_concurrency,
+                                                         store=store):
+                partial[index] += chunk
+                placeholders[index].markdown(f"**{EXPERT_PANEL[index][0]}** (responding): {partial[index]}")
+        for placeholder in placeholders:
+            placeholder.empty()
         st.success("Expert discussion updated.")
-        log = get_conversation_log()
-        for entry in log:
+    
+    # Render one page of the log; page 1 is the most recent.
+    page_size = 20
+    total_messages = store.count()
+    if total_messages:
+        page_count = (total_messages + page_size - 1) // page_size
+        log_page = st.number_input("Log Page (1 = most recent)", min_value=1, max_value=page_count, value=1)
+        for entry in store.page(log_page, page_size):
             st.markdown(f"**{entry['timestamp']} - {entry['expert']}**: {entry['message']}")
+    else:
+        st.info("No expert messages yet.")
 
 # --------------------------
 # VISUALIZATIONS PAGE
@@ -188,19 +307,133 @@ elif page == "Expert Collaboration":
 elif page == "Visualizations":
     st.header("Visualizations")
     viz_page = st.sidebar.radio("Select Visualization", ["Metric Variation Over Time", "Correlation Heatmap"])
-    # For visualizations, define ecosystem and sensor_cols here.
-    selected_ecosystem = st.sidebar.selectbox("Select Ecosystem", merged_data["Location"].unique().tolist(), key="vizEco")
-    df_ecosystem = merged_data[merged_data["Location"] == selected_ecosystem]
-    sensor_cols = [col for col in df_ecosystem.columns if col not in ["DateTime", "Location"]]
-    df_sim = df_ecosystem[["DateTime", "Location"] + sensor_cols]
+    # For visualizations, define the ecosystem here.
+    selected_ecosystem = st.sidebar.selectbox("Select Ecosystem", locations, key="vizEco")
     
     if viz_page == "Correlation Heatmap":
         st.subheader("Sensor Data Correlation")
-        corr_matrix = df_sim[sensor_cols].corr()
-        fig_corr = px.imshow(corr_matrix, text_auto=True, aspect="auto", title="Correlation Heatmap")
-        st.plotly_chart(fig_corr, use_container_width=True)
+        sensor_cols = data_index.sensor_columns(selected_ecosystem)
+        # Correlations combine cached per-day statistics instead of rescanning the whole history.
+        with span("app.correlation_engine", location=selected_ecosystem):
+            engine = data_index.correlation(selected_ecosystem)
+        first, last = (t.to_pydatetime() for t in engine.time_range())
+        start, end = st.slider("Time Range", min_value=first, max_value=last, value=(first, last),
+                               format="YYYY-MM-DD HH:mm", key="corrRange") if first < last else (first, last)
+        with span("app.correlation", location=selected_ecosystem):
+            corr_matrix = engine.corr(start, end)
+        with span("app.figure", chart="heatmap"):
+            fig_corr = px.imshow(corr_matrix, text_auto=True, aspect="auto", title="Correlation Heatmap")
+            st.plotly_chart(fig_corr, use_container_width=True)
+        
+        if len(sensor_cols) >= 2:
+            col1, col2 = st.columns(2)
+            sensor_x = col1.selectbox("Sensor", sensor_cols, index=0, key="corrX")
+            sensor_y = col2.selectbox("Compared With", sensor_cols, index=1, key="corrY")
+            
+            st.subheader("Rolling Correlation")
+            window_days = st.slider("Rolling Window (days)", 1, 30, 7)
+            with span("app.rolling_correlation", location=selected_ecosystem):
+                rolling = engine.rolling_corr(sensor_x, sensor_y, window=window_days)
+            st.line_chart(rolling)
+            
+            st.subheader("Lagged Cross-Correlation")
+            step = engine.spacing()
+            max_lag_hours = st.slider("Maximum Lag (hours)", 1, 72, 24)
+            max_lag = int(pd.Timedelta(hours=max_lag_hours) / step) if step > pd.Timedelta(0) else 0
+            with span("app.lagged_correlation", location=selected_ecosystem):
+                lagged = engine.lagged(sensor_x, sensor_y, max_lag)
+            lagged.index = lagged.index * step / pd.Timedelta(hours=1)
+            lagged.index.name = "Lag (hours)"
+            st.line_chart(lagged)
+            if lagged.notna().any():
+                best = lagged.abs().idxmax()
+                st.caption(f"Strongest correlation {lagged[best]:.2f} at a lag of {best:.2f} h "
+                           f"(positive: {sensor_y} follows {sensor_x}).")
     elif viz_page == "Metric Variation Over Time":
         st.subheader("Metric Variation Over Time")
-        selected_metric = st.selectbox("Select Metric", sensor_cols)
-        fig_line = px.line(df_sim, x="DateTime", y=selected_metric, title=f"{selected_metric} Over Time")
-        st.plotly_chart(fig_line, use_container_width=True)
+        # Only the selected metric's column is read from the partition.
+        selected_metric = st.selectbox("Select Metric", data_index.columns(selected_ecosystem))
+        # Draw from a precomputed min/max/mean pyramid so the payload stays bounded by the chart width.
+        with span("app.pyramid", location=selected_ecosystem, metric=selected_metric):
+            pyramid = data_index.pyramid(selected_ecosystem, selected_metric)
+        finest = next(iter(pyramid.values()))
+        if finest.empty:
+            st.info(f"No data recorded for {selected_metric}.")
+        else:
+            first, last = finest.index[0].to_pydatetime(), finest.index[-1].to_pydatetime()
+            start, end = st.slider("Time Range", min_value=first, max_value=last, value=(first, last),
+                                   format="YYYY-MM-DD HH:mm") if first < last else (first, last)
+            max_points = st.sidebar.slider("Chart Resolution (points)", 200, 4000, 1200, 100)
+            with span("app.downsample", metric=selected_metric):
+                level, points = downsample_for_chart(pyramid, selected_metric, start, end, max_points)
+            with span("app.figure", chart="metric"):
+                fig_line = go.Figure([
+                    go.Scatter(x=points["DateTime"], y=points["max"], mode="lines", line=dict(width=0),
+                               showlegend=False, hoverinfo="skip"),
+                    go.Scatter(x=points["DateTime"], y=points["min"], mode="lines", line=dict(width=0),
+                               fill="tonexty", name="min-max range", hoverinfo="skip"),
+                    go.Scatter(x=points["DateTime"], y=points["mean"], mode="lines", name="mean"),
+                ])
+                fig_line.update_layout(title=f"{selected_metric} Over Time ({level} resolution)",
+                                       xaxis_title="DateTime", yaxis_title=selected_metric)
+                st.plotly_chart(fig_line, use_container_width=True)
+
+# --------------------------
+# LIVE MONITOR PAGE
+# --------------------------
+elif page == "Live Monitor":
+    st.header("Live Monitor")
+    ingestor = get_stream_ingestor()
+    st.caption(f"Watching {', '.join(ingestor.watch_dirs)} for appended sensor rows; "
+               f"the last {ingestor.capacity} readings per sensor are kept in memory.")
+    if st.sidebar.checkbox("Auto-refresh", value=True, key="liveRefresh"):
+        auto_refresh = st.sidebar.slider("Refresh Interval (s)", 1, 60, 5)
+        refresh_status = st.sidebar.empty()
+    live_locations = ingestor.locations()
+    if not live_locations:
+        st.info("No new readings yet. Rows appended to the watched CSV files will appear here.")
+    else:
+        live_location = st.sidebar.selectbox("Select Ecosystem", live_locations, key="liveEco")
+        live_columns = ingestor.columns(live_location)
+        selected_live = st.multiselect("Sensors", live_columns, default=live_columns[:3])
+        with span("app.live_frame", location=live_location):
+            live_df = ingestor.frame(live_location, columns=selected_live)
+        st.caption(f"Last update: {ingestor.last_update:%Y-%m-%d %H:%M:%S}")
+        if selected_live and not live_df.empty:
+            latest = live_df.set_index("DateTime")[selected_live].ffill().iloc[-1]
+            for col, metric in zip(st.columns(len(selected_live)), selected_live):
+                col.metric(metric, f"{latest[metric]:.2f}")
+            st.line_chart(live_df.set_index("DateTime")[selected_live])
+
+# --------------------------
+# DIAGNOSTICS
+# --------------------------
+# app.startup is recorded once per process (the cold start), app.rerun for every later run.
+record_span("app.startup" if cold_start else "app.rerun", time.perf_counter() - script_start, page=page)
+run_spans = get_spans(run_id)
+with st.sidebar.expander("Diagnostics"):
+    st.checkbox("Profile reruns (cProfile)", key="profile_rerun")
+    if run_spans:
+        st.dataframe(pd.DataFrame(summarize(run_spans)).round(4), hide_index=True)
+    else:
+        st.caption("No spans recorded in this rerun.")
+    st.download_button("Spans (JSON lines)", to_jsonl(run_spans), file_name="simulad_spans.jsonl")
+    st.download_button("Metrics (Prometheus)", to_prometheus(), file_name="simulad_metrics.prom")
+    startup = get_totals().get("app.startup")
+    if startup is not None:
+        st.caption(f"Cold start of this server process: {startup[1]:.2f}s")
+    st.caption(f"Sensor data in memory: {sum(data_index.memory_usage().values()) / 1024 ** 2:.2f} MB")
+    if profiler is not None:
+        st.code(profile_report(profiler), language="text")
+        st.session_state.pop("active_profiler", None)
+export_from_env(run_spans)
+
+if auto_refresh:
+    # Wait in short slices, updating the countdown each time: every element update lets Streamlit
+    # interrupt this run for a pending widget interaction, and new readings end the wait early.
+    version = ingestor.version
+    deadline = time.monotonic() + auto_refresh
+    while time.monotonic() < deadline and ingestor.version == version:
+        refresh_status.caption(f"Next refresh in {deadline - time.monotonic():.0f}s")
+        time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+    st.rerun()
@@ -0,0 +1,192 @@
+# backtesting.py
+import numpy as np
+import pandas as pd
+
+from alternative_models import fit_arima, fit_prophet, future_times, select_series
+from diagnostics import timed
+from parallel import run_bounded, worker_cache, worker_registry
+from simulation import simulate_scenario, train_var_model
+from var_registry import VARRegistry
+
+MODELS = ["arima", "prophet", "var"]
+
+def rolling_origin_folds(n_rows, horizon=24, n_folds=3, step=None, min_train=None):
+    """
+    Returns the ascending training cutoffs (row counts) of rolling-origin folds: fold i trains on
+    rows [0, cutoff) and is scored on rows [cutoff, cutoff + horizon).
+    step: rows between consecutive cutoffs (default horizon, i.e. non-overlapping test windows).
+    min_train: smallest training length (default 2 * horizon); earlier folds are dropped.
+    """
+    step = step or horizon
+    min_train = min_train or 2 * horizon
+    cutoffs = [n_rows - horizon - i * step for i in range(n_folds)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+def model_forecasts(model, data, columns, steps, order=(1,1,1), cache=None, registry=None, location=None,
+                    times=None):
+    """
+    Forecasts `steps` data steps of some sensors with one model ("arima", "prophet" or "var").
+    data: simulation-ready frame (DateTime plus sensor columns). VAR is fitted once on all of
+      its non-constant sensor columns and forecasts every requested sensor (constant ones stay constant).
+    times: forecast timestamps, which Prophet predicts at (default: continuing the data's time step).
+    cache / registry: optional ModelCache and VARRegistry reused across calls.
+    Returns a dict mapping each column to a NumPy array of forecasts in the sensor's units.
+    """
+    if model == "arima":
+        return {column: fit_arima(select_series(data, column), order=order, cache=cache, location=location)
+                .forecast(steps=steps).to_numpy() for column in columns}
+    if model == "prophet":
+        if times is None:
+            times = future_times(data["DateTime"], steps)
+        forecasts = {}
+        for column in columns:
+            ts = select_series(data, column).reset_index().rename(columns={"DateTime": "ds", column: "y"})
+            m = fit_prophet(ts, cache=cache, location=location, column=column)
+            forecasts[column] = m.predict(pd.DataFrame({"ds": times}))["yhat"].to_numpy()
+        return forecasts
+    if model == "var":
+        frame = data.drop(columns=["Location"], errors="ignore")
+        # Constant sensors make the VAR covariance singular.
+        constant = [col for col in frame.columns[1:] if frame[col].nunique() < 2]
+        frame = frame.drop(columns=constant)
+        if frame.shape[1] < 3:
+            raise ValueError("VAR needs at least two varying sensors")
+        results, last_level = train_var_model(frame, registry=registry, location=location)
+        forecast = simulate_scenario(frame, results, {}, steps=steps, last_level=last_level)
+        forecasts = {}
+        for column in columns:
+            converted = column.replace("degC", "degF").replace("DEGC", "degF")
+            if column in constant:
+                forecasts[column] = np.full(steps, float(data[column].iloc[-1]))
+            elif converted != column:
+                # train_var_model works in Fahrenheit; report the sensor's own units.
+                forecasts[column] = ((forecast[converted] - 32) / 1.8).to_numpy()
+            else:
+                forecasts[column] = forecast[column].to_numpy()
+        return forecasts
+    raise ValueError(f"Unknown forecast model: {model}")
+
+def forecast_errors(actual, forecast):
+    """Returns MAE, RMSE and MAPE (in %, over non-zero actuals) of a forecast."""
+    actual = np.asarray(actual, dtype=float)
+    error = np.asarray(forecast, dtype=float) - actual
+    nonzero = actual != 0
+    return {
+        "MAE": float(np.mean(np.abs(error))),
+        "RMSE": float(np.sqrt(np.mean(error ** 2))),
+        "MAPE": float(np.mean(np.abs(error[nonzero] / actual[nonzero])) * 100) if nonzero.any() else np.nan,
+    }
+
+def _fold_task(location, model, train, test, order, cache_dir, registry_dir):
+    """
+    Fits one model on one fold inside a worker and scores it.
+    Returns a dict mapping each test column to its error metrics, or the error message.
+    """
+    registry = worker_registry(registry_dir) if model == "var" else None
+    return _run_fold(location, model, train, test, order, worker_cache(cache_dir), registry)
+
+def _run_fold(location, model, train, test, order, cache, registry):
+    columns = [col for col in test.columns if col != "DateTime"]
+    try:
+        forecasts = model_forecasts(model, train, columns, len(test), order=order, cache=cache, registry=registry,
+                                    location=location, times=pd.DatetimeIndex(test["DateTime"]))
+    except Exception as e:
+        return str(e)
+    return {column: forecast_errors(test[column], forecasts[column]) for column in columns}
+
+@timed("backtest")
+def backtest(frames, models=MODELS, columns=None, horizon=24, n_folds=3, step=None, order=(1,1,1),
+             workers=1, max_pending=None, cache=None, registry=None):
+    """
+    Rolling-origin backtest of forecast models on every sensor of one or more locations.
+    frames: dict mapping location to its simulation-ready frame (DateTime plus sensor columns).
+    models: subset of MODELS; columns: optional list of sensors to restrict the backtest to.
+    horizon / n_folds / step: see rolling_origin_folds.
+    workers: number of processes running fits in parallel (1 runs serially, None uses all CPUs);
+      ARIMA and Prophet run one task per sensor and fold, VAR one task per location and fold.
+      max_pending bounds the tasks queued at once (default 2 * workers).
+    cache / registry: optional ModelCache and VARRegistry; workers share their disk tiers, so
+      refitting a fold already seen (e.g. an unchanged backtest) is a cache hit for every model
+      (the registry keeps one VAR fit per training prefix), and later VAR folds reuse the lag order
+      selected on earlier ones.
+    Returns a tidy DataFrame with Location, Sensor, Model, Cutoff, MAE, RMSE and MAPE per fold.
+    Fits that fail are listed in the result's attrs["errors"].
+    """
+    tasks = []
+    for location, data in frames.items():
+        data = data.drop(columns=["Location"], errors="ignore").reset_index(drop=True)
+        sensors = [col for col in data.columns if col != "DateTime" and (columns is None or col in columns)]
+        for cutoff in rolling_origin_folds(len(data), horizon, n_folds, step):
+            train = data.iloc[:cutoff]
+            test = data.iloc[cutoff:cutoff + horizon]
+            for model in models:
+                if model == "var":
+                    tasks.append((location, model, train, test[["DateTime"] + sensors]))
+                else:
+                    for column in sensors:
+                        tasks.append((location, model, train[["DateTime", column]], test[["DateTime", column]]))
+
+    if registry is None and "var" in models:
+        registry = VARRegistry(None)
+    if workers == 1 or len(tasks) <= 1:
+        results = [_run_fold(location, model, train, test, order, cache, registry)
+                   for location, model, train, test in tasks]
+    else:
+        cache_dir = cache.cache_dir if cache is not None else None
+        registry_dir = registry.registry_dir if registry is not None else None
+        results = run_bounded(_fold_task, [(location, model, train, test, order, cache_dir, registry_dir)
+                                           for location, model, train, test in tasks],
+                              workers=workers, max_pending=max_pending)
+
+    rows, errors = [], {}
+    for (location, model, _, test), result in zip(tasks, results):
+        cutoff = test["DateTime"].iloc[0]
+        if isinstance(result, str):
+            for column in test.columns[1:]:
+                errors[(location, column, model, cutoff)] = result
+            continue
+        for column, metrics in result.items():
+            rows.append({"Location": location, "Sensor": column, "Model": model, "Cutoff": cutoff, **metrics})
+    folds = pd.DataFrame(rows, columns=["Location", "Sensor", "Model", "Cutoff", "MAE", "RMSE", "MAPE"])
+    folds.attrs["errors"] = errors
+    return folds
+
+def score_models(folds, metric="MAE"):
+    """
+    Averages fold errors per location, sensor and model and derives ensemble weights
+    proportional to the inverse of `metric` (normalized per sensor).
+    Returns a DataFrame with Location, Sensor, Model, Folds, MAE, RMSE, MAPE and Weight, best model first.
+    """
+    scores = (folds.groupby(["Location", "Sensor", "Model"], sort=False)
+              .agg(Folds=("Cutoff", "count"), MAE=("MAE", "mean"), RMSE=("RMSE", "mean"), MAPE=("MAPE", "mean"))
+              .reset_index())
+    inverse = 1.0 / scores[metric].clip(lower=1e-12)
+    scores["Weight"] = inverse / inverse.groupby([scores["Location"], scores["Sensor"]]).transform("sum")
+    return scores.sort_values(["Location", "Sensor", metric]).reset_index(drop=True)
+
+def ensemble_forecast(data, weights, column, steps=24, order=(1,1,1), cache=None, registry=None, location=None):
+    """
+    Weighted ensemble forecast of one sensor for the next `steps` data steps.
+    weights: dict mapping model name to weight (e.g. the Weight column of score_models).
+    Models that fail are left out and the remaining weights renormalized.
+    Returns a DataFrame with the ensemble (named after the sensor) and one column per member model,
+    indexed by the forecast timestamps; attrs["errors"] lists the failed models.
+    """
+    times = future_times(data["DateTime"], steps)
+    members, errors = {}, {}
+    for model, weight in weights.items():
+        if weight <= 0:
+            continue
+        try:
+            members[model] = model_forecasts(model, data, [column], steps, order=order, cache=cache,
+                                             registry=registry, location=location, times=times)[column]
+        except Exception as e:
+            errors[model] = str(e)
+    if not members:
+        raise ValueError(f"Every ensemble member failed: {errors}")
+    total = sum(weights[model] for model in members)
+    forecast = pd.DataFrame(members, index=times)
+    forecast.insert(0, column, sum(forecast[model] * weights[model] / total for model in members))
+    forecast.index.name = "DateTime"
+    forecast.attrs["errors"] = errors
+    return forecast
@@ -0,0 +1,303 @@
+# benchmark.py
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import importlib
+import contextlib
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_REPORT_PATH = "benchmark_report.json"
+DEFAULT_BASELINE_PATH = "benchmark_baseline.json"
+
+BENCHMARKS = ["load_all_csv", "merge_by_location", "forecast_arima", "forecast_prophet",
+              "train_var_model", "simulate_scenario", "generate_summary", "app_cold_start"]
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+SENTINEL = -9999
+
+def _month_starts(start, months):
+    return pd.date_range(pd.Timestamp(start).to_period("M").to_timestamp(), periods=months + 1, freq="MS")
+
+def _month_tag(month_start):
+    """Returns the file name suffix of a month, e.g. "FEB-2025" (as in data/)."""
+    return month_start.strftime("%b-%Y").upper()
+
+def _signal(rng, index, n_cols, level, amplitude, noise):
+    """Returns an (len(index), n_cols) array of daily cycles plus a random walk and noise."""
+    hours = (index.hour + index.minute / 60).to_numpy()
+    daily = amplitude * np.sin(2 * np.pi * (hours - 9) / 24)
+    drift = np.cumsum(rng.normal(0, noise / 10, (len(index), n_cols)), axis=0)
+    offsets = rng.normal(0, amplitude / 10, n_cols)
+    return level + daily[:, None] + offsets + drift + rng.normal(0, noise, (len(index), n_cols))
+
+def _write_csv(path, index, values, columns, sentinel_rate, rng, date_format="%Y/%m/%d %H:%M"):
+    """Writes one raw sensor file, replacing a fraction of the readings with the -9999 sentinel."""
+    values = np.round(values, 6)
+    if sentinel_rate:
+        values[rng.random(values.shape) < sentinel_rate] = SENTINEL
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, "DateTime", index.strftime(date_format))
+    df.to_csv(path, index=False)
+
+def generate_dataset(out_dir, months=1, columns=24, sensors=4, start="2025-02-01", sentinel_rate=0.01, seed=0):
+    """
+    Writes synthetic raw sensor files mimicking the layouts in data/, one file per variable and month:
+      - wide LEO-W grids (HMP60 temperature and humidity) with `columns` sensors every 15 minutes,
+      - `sensors` extra single-column LEO-W files every 15 minutes,
+      - 1-minute LEO-W air pressure,
+      - irregular LICOR CO2 readings (roughly every two hours, with seconds) where each row
+        has -9999 in one of its two columns,
+      - 15-minute RainForest, Ocean and Desert files.
+    sentinel_rate: fraction of regular readings replaced by -9999.
+    Returns the list of written file paths.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    bounds = _month_starts(start, months)
+    paths = []
+
+    for month_start, month_end in zip(bounds[:-1], bounds[1:]):
+        tag = _month_tag(month_start)
+        grid = pd.date_range(month_start, month_end, freq="15min", inclusive="left")
+        minutes = pd.date_range(month_start, month_end, freq="1min", inclusive="left")
+
+        def write(name, index, values, cols, sentinels=sentinel_rate, **kwargs):
+            path = os.path.join(out_dir, f"{name}_{tag}.csv")
+            _write_csv(path, index, values, cols, sentinels, rng, **kwargs)
+            paths.append(path)
+
+        grid_cols = [f"LEO-W_{i // 5 * 7 + 4}_0_{i % 5 + 1}" for i in range(columns)]
+        write("LEO-W_HMP60_Temp_degC", grid, _signal(rng, grid, columns, 28, 4, 0.2), grid_cols)
+        write("LEO-W_HMP60_RH_%", grid, _signal(rng, grid, columns, 55, 15, 1.0), grid_cols)
+        for i in range(sensors):
+            write(f"LEO-W_Sensor{i + 1}_units", grid, _signal(rng, grid, 1, 100, 30, 2.0), ["Value"])
+        write("LEO-W_PTB_Pa_hPa", minutes, _signal(rng, minutes, 1, 887, 1, 0.01), ["AirPress_hPa"])
+
+        # Irregular LICOR readings: only one of the two channels is valid in each row.
+        offsets = np.cumsum(rng.uniform(5400, 9000, int((month_end - month_start).total_seconds() / 5400)))
+        licor = month_start + pd.to_timedelta(offsets[offsets < (month_end - month_start).total_seconds()], unit="s")
+        licor = pd.DatetimeIndex(licor).floor("s")
+        values = _signal(rng, licor, 2, 450, 10, 1.0)
+        values[np.arange(len(licor)), rng.integers(0, 2, len(licor))] = SENTINEL
+        write("LEO-W_LICOR_CO2", licor, values, ["CO2_in(ppm)", "CO2_out(ppm)"], sentinels=0,
+              date_format="%Y/%m/%d %H:%M:%S")
+
+        write("RF_MountainTower_Temp", grid, _signal(rng, grid, 1, 24, 5, 0.2), ["Temp[degC]"])
+        write("RF_CO2", grid, _signal(rng, grid, 3, 800, 200, 10), ["CO2_MNT[ppm]", "CO2_LL1m[ppm]", "CO2_LL13m[ppm]"])
+        write("Ocean", grid, _signal(rng, grid, 4, 20, 0.5, 0.05), ["Ph[Ph]", "Temp[degC]", "Sal[psu]", "ODO[mgpl]"])
+        write("Desert_Temp_RH", grid, _signal(rng, grid, 2, 30, 10, 0.5), ["Temp[degC]", "RH[%]"])
+    return paths
+
+def time_call(func, repeat=3):
+    """
+    Calls func() repeat times, silencing its printed output.
+    Returns (timings, last result) where timings is a dict of min/median/max seconds and the raw runs.
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            runs.append(time.perf_counter() - start)
+    timings = {"min": min(runs), "median": float(np.median(runs)), "max": max(runs), "runs": runs}
+    return timings, result
+
+def app_cold_start(work_dir, timeout=600):
+    """
+    Renders the app's default page once in a fresh Python process (Streamlit's AppTest runner),
+    with work_dir as the working directory, so it reads work_dir/merged_store.
+    Raises RuntimeError if the app fails.
+    """
+    script = (f"from streamlit.testing.v1 import AppTest\n"
+              f"at = AppTest.from_file({APP_PATH!r}, default_timeout={timeout}).run()\n"
+              f"raise SystemExit(str(at.exception[0].message) if at.exception else 0)\n")
+    # `streamlit run` puts the app's directory on the path; the test runner does not.
+    path = os.pathsep.join(filter(None, [os.path.dirname(APP_PATH), os.environ.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-c", script], cwd=work_dir, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=path))
+    if proc.returncode:
+        raise RuntimeError(f"App failed to start: {proc.stderr.strip()[-500:]}")
+
+def run_benchmarks(data_dir, repeat=3, workers=1, engine="c", fit_rows=None, var_columns=4,
+                   llm_calls=5, skip=()):
+    """
+    Times the ingestion, merge, forecasting, simulation and LLM steps on the files in data_dir.
+    fit_rows: number of most recent merged LEO-W rows the models are fitted on (None = all).
+    var_columns: number of LEO-W sensors in the VAR model.
+    llm_calls: generate_summary calls per run, answered by an in-process stub Ollama server.
+    skip: names of benchmarks (see BENCHMARKS) not to run.
+    app_cold_start times a fresh process rendering the app's default page on the merged data,
+    interpreter start and imports included.
+    Returns a dict mapping benchmark names to their timings.
+    """
+    dp = importlib.import_module("data-processing")
+    from data_access import prepare_simulation_frame
+    results = {}
+
+    def bench(name, func):
+        if name in skip:
+            return None
+        timings, result = time_call(func, repeat)
+        results[name] = timings
+        print(f"{name:<20} median {timings['median']:.4f}s  min {timings['min']:.4f}s")
+        return result
+
+    # Ingestion and merge results feed the model benchmarks, so compute them even when skipped.
+    dfs = bench("load_all_csv", lambda: dp.load_all_csv(data_dir, workers=workers, engine=engine))
+    if dfs is None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            dfs = dp.load_all_csv(data_dir, workers=workers, engine=engine)
+    merged = bench("merge_by_location", lambda: dp.merge_by_location(dfs))
+    if merged is None:
+        merged = dp.merge_by_location(dfs)
+
+    prepared = prepare_simulation_frame(merged["LEO-W"]).data
+    if fit_rows:
+        prepared = prepared.iloc[-fit_rows:].reset_index(drop=True)
+    series = prepared[["DateTime", "LEO-W_HMP60_Temp_degC"]]
+
+    if "forecast_arima" not in skip or "forecast_prophet" not in skip:
+        from alternative_models import forecast_arima, forecast_prophet
+        bench("forecast_arima", lambda: forecast_arima(series))
+        bench("forecast_prophet", lambda: forecast_prophet(series))
+
+    from simulation import simulate_scenario, train_var_model
+    var_data = prepared[["DateTime"] + list(prepared.columns[1:1 + var_columns])]
+    var_results, last_level = train_var_model(var_data)
+    bench("train_var_model", lambda: train_var_model(var_data))
+    adjustments = {var_data.columns[1].replace("degC", "degF"): 1.0}
+    bench("simulate_scenario", lambda: simulate_scenario(var_data, var_results, adjustments,
+                                                         last_level=last_level))
+
+    if "generate_summary" not in skip:
+        from ollama_stub import StubOllamaServer
+        with StubOllamaServer() as server:
+            # The benchmark process owns the LLM client, so point it at the stub before first use.
+            os.environ["OLLAMA_HOST"] = server.url
+            from ai_integration import generate_summary
+            text = f"Forecast for LEO-W: {series.iloc[-24:, 1].round(2).tolist()}"
+            bench("generate_summary",
+                  lambda: [generate_summary(f"{text} (run {i})", use_cache=False) for i in range(llm_calls)])
+
+    if "app_cold_start" not in skip:
+        from storage import write_store
+        work_dir = tempfile.mkdtemp(prefix="simulad_app_")
+
+        def cold_start():
+            # Each run starts without the app's disk caches, like a freshly deployed server.
+            shutil.rmtree(os.path.join(work_dir, ".simulad_cache"), ignore_errors=True)
+            app_cold_start(work_dir)
+
+        try:
+            write_store(merged, os.path.join(work_dir, "merged_store"))
+            bench("app_cold_start", cold_start)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def build_report(results, config):
+    """Returns the machine-readable report: benchmark timings plus the configuration and environment."""
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+
+def compare_to_baseline(report, baseline, tolerance=0.25, min_delta=0.01):
+    """
+    Compares the median timings of a report with a baseline report.
+    A benchmark regressed if it is more than `tolerance` (relative) and `min_delta` seconds slower.
+    Returns a list of dicts (name, baseline, current, ratio, regressed) for the benchmarks in both reports.
+    """
+    if baseline.get("config") != report.get("config"):
+        print("Warning: the baseline was recorded with a different configuration.")
+    comparison = []
+    for name, timings in report["results"].items():
+        if name not in baseline.get("results", {}):
+            continue
+        before = baseline["results"][name]["median"]
+        after = timings["median"]
+        ratio = after / before if before else float("inf")
+        comparison.append({
+            "name": name,
+            "baseline": before,
+            "current": after,
+            "ratio": ratio,
+            "regressed": ratio > 1 + tolerance and after - before > min_delta,
+        })
+    return comparison
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SimuLad on synthetic sensor data.")
+    parser.add_argument("--months", type=int, default=1, help="Months of data to generate.")
+    parser.add_argument("--columns", type=int, default=24, help="Sensors in each wide LEO-W grid file.")
+    parser.add_argument("--sensors", type=int, default=4, help="Extra single-column LEO-W files per month.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--data-dir", default=None,
+                        help="Where to write the synthetic files (default: a temporary directory, removed afterwards).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the median is reported.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used by load_all_csv.")
+    parser.add_argument("--engine", default="c", choices=["auto", "c", "python", "pyarrow"],
+                        help="pandas CSV engine used by load_all_csv.")
+    parser.add_argument("--fit-rows", type=int, default=None,
+                        help="Fit the models on the last N merged rows only (default: all rows).")
+    parser.add_argument("--skip", nargs="*", default=[], choices=BENCHMARKS, help="Benchmarks not to run.")
+    parser.add_argument("--output", default=DEFAULT_REPORT_PATH, help="Path of the JSON report.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline report to compare with.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown against the baseline before failing.")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="simulad_bench_")
+    try:
+        start = time.perf_counter()
+        files = generate_dataset(data_dir, months=args.months, columns=args.columns,
+                                 sensors=args.sensors, seed=args.seed)
+        print(f"Generated {len(files)} files in {data_dir} ({time.perf_counter() - start:.1f}s)")
+        results = run_benchmarks(data_dir, repeat=args.repeat, workers=args.workers, engine=args.engine,
+                                 fit_rows=args.fit_rows, skip=args.skip)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    config = {key: getattr(args, key) for key in ["months", "columns", "sensors", "seed", "repeat",
+                                                  "workers", "engine", "fit_rows"]}
+    report = build_report(results, config)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare_to_baseline(report, baseline, tolerance=args.tolerance)
+        for row in comparison:
+            flag = "REGRESSION" if row["regressed"] else "ok"
+            print(f"{row['name']:<20} {row['baseline']:.4f}s -> {row['current']:.4f}s "
+                  f"({row['ratio']:.2f}x) {flag}")
+        if any(row["regressed"] for row in comparison):
+            sys.exit(1)
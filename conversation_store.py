@@ -0,0 +1,111 @@
+# conversation_store.py
+import os
+import time
+import sqlite3
+import datetime
+import threading
+from collections import deque
+
+DEFAULT_DB_PATH = os.path.join(".simulad_cache", "conversations.sqlite")
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+def _connect(path):
+    """Returns the process-wide SQLite connection (and its lock) for a database path."""
+    with _connections_lock:
+        if path not in _connections:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, created REAL,"
+                " timestamp TEXT, expert TEXT, message TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_created ON messages (created)")
+            conn.commit()
+            _connections[path] = (conn, threading.Lock())
+        return _connections[path]
+
+class ConversationStore:
+    """
+    Expert conversation log for one session.
+    Messages are appended to a SQLite table shared by all sessions of the process, and the
+    most recent ring_size entries are also kept in an in-memory ring buffer for cheap rendering.
+    Retention: a session keeps at most max_messages messages, and messages older than
+    max_age seconds are purged from every session.
+    """
+
+    def __init__(self, session_id, path=DEFAULT_DB_PATH, ring_size=50, max_messages=500, max_age=30 * 24 * 3600):
+        self.session_id = session_id
+        self.max_messages = max_messages
+        self.max_age = max_age
+        self._conn, self._lock = _connect(path)
+        rows = self._conn.execute(
+            "SELECT timestamp, expert, message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, ring_size),
+        ).fetchall()
+        self._recent = deque((self._entry(row) for row in reversed(rows)), maxlen=ring_size)
+
+    @staticmethod
+    def _entry(row):
+        return {"timestamp": row[0], "expert": row[1], "message": row[2]}
+
+    def add(self, expert, message):
+        """Appends a message, applies the retention limits and returns the new entry."""
+        now = time.time()
+        entry = {
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "expert": expert,
+            "message": message,
+        }
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO messages (session_id, created, timestamp, expert, message) VALUES (?, ?, ?, ?, ?)",
+                (self.session_id, now, entry["timestamp"], expert, message),
+            )
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.session_id, self.session_id, self.max_messages),
+            )
+            if self.max_age is not None:
+                self._conn.execute("DELETE FROM messages WHERE created < ?", (now - self.max_age,))
+            self._conn.commit()
+        self._recent.append(entry)
+        return entry
+
+    def recent(self):
+        """Returns the entries in the ring buffer, oldest first."""
+        return list(self._recent)
+
+    def count(self):
+        """Returns the number of stored messages of this session."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?",
+                                      (self.session_id,)).fetchone()[0]
+
+    def page(self, page=1, page_size=20):
+        """
+        Returns one page of the log, oldest first within the page.
+        Page 1 holds the most recent page_size messages, page 2 the ones before them, and so on.
+        """
+        if page == 1 and page_size <= len(self._recent):
+            return list(self._recent)[-page_size:]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, expert, message FROM messages WHERE session_id = ?"
+                " ORDER BY id DESC LIMIT ? OFFSET ?",
+                (self.session_id, page_size, (page - 1) * page_size),
+            ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def clear(self):
+        """Deletes every message of this session."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            self._conn.commit()
+        self._recent.clear()
@@ -0,0 +1,181 @@
+# correlation.py
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK = "1D"
+
+def _chunk_stats(values):
+    """
+    Returns the (4, k, k) sufficient statistics of a block of rows, pairwise over the rows where
+    both columns are present: counts n[i, j], sums s[i, j] of column i, sums of squares q[i, j]
+    of column i, and cross products p[i, j]. Statistics of disjoint blocks add up.
+    """
+    mask = ~np.isnan(values)
+    m = mask.astype(float)
+    x = np.where(mask, values, 0.0)
+    return np.stack([m.T @ m, x.T @ m, (x * x).T @ m, x.T @ x])
+
+def _corr_from_stats(stats):
+    """Returns the pairwise-complete Pearson correlation matrix (as DataFrame.corr) from summed statistics."""
+    n, s, q, p = stats
+    cov = n * p - s * s.T
+    var = n * q - s ** 2
+    denom = np.sqrt(np.clip(var * var.T, 0, None))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / denom
+    corr[(n < 2) | ~(denom > 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+def lagged_cross_correlation(x, y, max_lag):
+    """
+    Returns corr(x[t], y[t + lag]) for lag = -max_lag..max_lag as a Series indexed by lag (in samples),
+    for two series on the same regular time grid. A positive peak lag means y follows x.
+    Computed with FFTs in O(n log n); missing values are skipped and every lag is normalized
+    by its number of overlapping pairs.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    max_lag = min(max_lag, n - 1)
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    lags = np.arange(-max_lag, max_lag + 1)
+    if mx.sum() < 2 or my.sum() < 2:
+        return pd.Series(np.nan, index=pd.Index(lags, name="lag"))
+    x0 = np.where(mx, x - x[mx].mean(), 0.0)
+    y0 = np.where(my, y - y[my].mean(), 0.0)
+    # Zero-pad to at least 2n - 1 so the circular correlation equals the linear one.
+    size = 1 << (2 * n - 1).bit_length()
+
+    def xcorr(a, b):
+        # c[lag] = sum_t a[t] * b[t + lag]; negative lags wrap around to the end.
+        return np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)[lags % size]
+
+    num = xcorr(x0, y0)
+    count = np.rint(xcorr(mx.astype(float), my.astype(float)))
+    scale = np.sqrt((x0 ** 2).sum() / mx.sum() * (y0 ** 2).sum() / my.sum())
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.where(count > 1, num / (count * scale), np.nan)
+    return pd.Series(np.clip(r, -1.0, 1.0), index=pd.Index(lags, name="lag"))
+
+class CorrelationEngine:
+    """
+    Correlations between the sensor columns of a location frame, served from cached sufficient
+    statistics per time chunk (see _chunk_stats), so the full-range matrix, any time window and
+    rolling windows combine chunk statistics instead of rescanning rows; only the rows of
+    partially covered edge chunks are read again.
+    Values are shifted by a fixed per-column offset (the first median seen) to keep the sums
+    numerically stable; correlations do not depend on the shift.
+    """
+
+    def __init__(self, df=None, columns=None, chunk=DEFAULT_CHUNK):
+        self.chunk = chunk
+        self.columns = list(columns) if columns is not None else None
+        self._times = np.array([], dtype="datetime64[ns]")
+        self._values = None
+        self._shift = None
+        self._keys = []       # chunk start per chunk
+        self._bounds = []     # [first row, end row) per chunk
+        self._stats = []      # (4, k, k) statistics per chunk
+        self._total = None    # sum of all chunk statistics
+        if df is not None:
+            self.add(df)
+
+    def add(self, df):
+        """
+        Appends rows (DateTime plus the sensor columns) later than every row added so far.
+        Only the chunks the new rows fall into are updated.
+        """
+        if self.columns is None:
+            self.columns = [col for col in df.columns if col not in ["DateTime", "Location"]]
+        df = df.sort_values("DateTime")
+        times = df["DateTime"].to_numpy(dtype="datetime64[ns]")
+        if not len(times):
+            return
+        if len(self._times) and times[0] <= self._times[-1]:
+            raise ValueError("Rows must be appended after the last DateTime already added")
+        values = df[self.columns].to_numpy(dtype=float)
+        if self._shift is None:
+            self._shift = np.nan_to_num(np.nanmedian(values, axis=0)) if np.isfinite(values).any() \
+                else np.zeros(len(self.columns))
+        values = values - self._shift
+
+        offset = len(self._times)
+        self._times = np.concatenate([self._times, times])
+        self._values = values if self._values is None else np.concatenate([self._values, values])
+        keys = pd.DatetimeIndex(times).floor(self.chunk)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(times)]
+        for lo, hi in zip(starts, ends):
+            stats = _chunk_stats(values[lo:hi])
+            self._total = stats if self._total is None else self._total + stats
+            if self._keys and self._keys[-1] == keys[lo]:
+                # The rows extend the last chunk: statistics are additive.
+                self._stats[-1] = self._stats[-1] + stats
+                self._bounds[-1] = (self._bounds[-1][0], offset + hi)
+            else:
+                self._keys.append(keys[lo])
+                self._stats.append(stats)
+                self._bounds.append((offset + lo, offset + hi))
+
+    def time_range(self):
+        """Returns the first and last DateTime added, or (None, None)."""
+        if not len(self._times):
+            return None, None
+        return pd.Timestamp(self._times[0]), pd.Timestamp(self._times[-1])
+
+    def spacing(self):
+        """Returns the median time step between rows as a Timedelta."""
+        if len(self._times) < 2:
+            return pd.Timedelta(0)
+        return pd.Timedelta(np.median(np.diff(self._times)))
+
+    def _range_stats(self, start=None, end=None):
+        k = len(self.columns)
+        if not self._stats:
+            return np.zeros((4, k, k))
+        if start is None and end is None:
+            return self._total
+        lo = 0 if start is None else np.searchsorted(self._times, np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(self._times) if end is None else np.searchsorted(self._times, np.datetime64(pd.Timestamp(end)), "right")
+        full = [c for c, (c_lo, c_hi) in enumerate(self._bounds) if c_lo >= lo and c_hi <= hi]
+        if not full:
+            return _chunk_stats(self._values[lo:hi]) if hi > lo else np.zeros((4, k, k))
+        stats = np.sum([self._stats[c] for c in full], axis=0)
+        # Edge rows outside the fully covered chunks.
+        first_row, last_row = self._bounds[full[0]][0], self._bounds[full[-1]][1]
+        if first_row > lo:
+            stats = stats + _chunk_stats(self._values[lo:first_row])
+        if hi > last_row:
+            stats = stats + _chunk_stats(self._values[last_row:hi])
+        return stats
+
+    def corr(self, start=None, end=None):
+        """Returns the correlation matrix over rows with start <= DateTime <= end (default: all rows)."""
+        return pd.DataFrame(_corr_from_stats(self._range_stats(start, end)), index=self.columns, columns=self.columns)
+
+    def rolling_corr(self, x, y, window=7):
+        """
+        Returns the correlation between columns x and y over a rolling window of `window` chunks,
+        as a Series indexed by the start of each window's last chunk (NaN until a full window).
+        """
+        i, j = self.columns.index(x), self.columns.index(y)
+        window = max(1, window)
+        stats = np.asarray(self._stats)
+        # Per chunk: pair count, sums and sums of squares of x and y, and their cross product.
+        pair = np.stack([stats[:, 0, i, j], stats[:, 1, i, j], stats[:, 1, j, i],
+                         stats[:, 2, i, j], stats[:, 2, j, i], stats[:, 3, i, j]], axis=1)
+        cumulative = np.cumsum(pair, axis=0)
+        windows = cumulative.copy()
+        windows[window:] -= cumulative[:-window]
+        n, sx, sy, qx, qy, p = windows.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = (n * p - sx * sy) / np.sqrt((n * qx - sx ** 2) * (n * qy - sy ** 2))
+        values[n < 2] = np.nan
+        values = np.clip(values, -1.0, 1.0)
+        values[:window - 1] = np.nan
+        return pd.Series(values, index=pd.DatetimeIndex(self._keys, name="DateTime"), name=f"{x} vs {y}")
+
+    def lagged(self, x, y, max_lag):
+        """Returns lagged_cross_correlation of columns x and y (lags in rows, see spacing)."""
+        i, j = self.columns.index(x), self.columns.index(y)
+        return lagged_cross_correlation(self._values[:, i], self._values[:, j], max_lag)
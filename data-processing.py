@@ -1,7 +1,29 @@
 import os
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 
+from storage import (DEFAULT_STORE_DIR, list_file_cache, list_locations, load_manifest, load_manifest_settings,
+                     read_file_cache, remove_file_cache, remove_location, save_manifest, write_file_cache,
+                     write_location)
+
+# Timestamp layouts found in the raw sensor exports, tried in order.
+# Most files use "2025/02/01 00:00"; some (e.g. LEO-W_DVI7911_wd_deg) use "2/1/2025 0:00",
+# and the LICOR files carry seconds ("2025/02/01 01:56:38").
+DATETIME_FORMATS = [
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+]
+
+# Default spacing of the per-location time grid built by merge_by_location.
+DEFAULT_FREQ = "15min"
+
 def get_location_from_filename(file_path):
     """
     Extracts the location from the CSV file name.
@@ -31,21 +53,78 @@ def get_variable_from_filename(file_path):
         variable = "Measurement"
     return variable
 
-def load_csv_with_location(file_path):
+def resolve_csv_engine(engine="auto"):
+    """
+    Resolves the pandas CSV engine to use.
+    "auto" picks the multithreaded pyarrow reader when pyarrow is installed
+    and falls back to the default C engine otherwise.
+    """
+    if engine != "auto":
+        return engine
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "c"
+    return "pyarrow"
+
+def detect_datetime_format(values, sample_size=50):
+    """
+    Detects the timestamp format of a column from an evenly spaced sample of its values.
+    Returns the first entry of DATETIME_FORMATS that parses every sampled value,
+    or None if no known format matches.
+    """
+    sample = pd.Series(values).dropna().astype(str).str.strip()
+    sample = sample[sample != ""]
+    if sample.empty:
+        return None
+    if len(sample) > sample_size:
+        sample = sample.iloc[np.linspace(0, len(sample) - 1, sample_size).astype(int)]
+    for fmt in DATETIME_FORMATS:
+        if pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+def parse_datetime_column(values):
+    """
+    Parses a column of timestamps in a single vectorized pass.
+    The format is detected once from a sample; any values that do not match it
+    (e.g. a file with mixed layouts) fall back to pandas' per-value inference.
+    """
+    values = pd.Series(values)
+    fmt = detect_datetime_format(values)
+    if fmt is None:
+        return pd.to_datetime(values, errors="coerce")
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    unparsed = parsed.isna() & values.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(values[unparsed], errors="coerce")
+    return parsed
+
+def load_csv_with_location(file_path, engine="c"):
     """
     Loads a CSV file, ensuring the DateTime column is parsed,
     extracts the location and variable from the file name,
     adds a 'Location' column, renames the first measurement column
     to a unique name, and drops any additional columns.
+    Only the DateTime and first measurement columns are read from disk.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    df = pd.read_csv(file_path, usecols=list(header[:2]), engine=resolve_csv_engine(engine))
+    return clean_sensor_frame(df, file_path)
+
+def clean_sensor_frame(df, file_path):
+    """
+    Applies the load_csv_with_location rules to rows read from file_path (e.g. rows appended
+    to a file that is being tailed): parses DateTime, adds the Location column, renames the first
+    measurement column to its unique name and replaces -9999 with NaN.
+    Returns a DataFrame with DateTime, Location and the unique measurement column.
     """
-    df = pd.read_csv(file_path)
-    
     # Rename first column to DateTime if needed.
     if "DateTime" not in df.columns:
         df.rename(columns={df.columns[0]: "DateTime"}, inplace=True)
     
     # Parse DateTime column.
-    df["DateTime"] = pd.to_datetime(df["DateTime"], errors='coerce')
+    df["DateTime"] = parse_datetime_column(df["DateTime"])
     
     # Extract location and variable from file name.
     location = get_location_from_filename(file_path)
@@ -80,27 +159,115 @@ def load_csv_with_location(file_path):
     
     return df
 
-def load_all_csv(data_dir="data"):
+def _load_csv_safe(file_path, engine="c"):
+    """
+    Worker wrapper around load_csv_with_location that returns (DataFrame, error)
+    instead of raising, so one bad file does not abort a pooled load.
+    """
+    try:
+        df = load_csv_with_location(file_path, engine=engine)
+    except Exception as e:
+        return None, e
+    if df.empty:
+        # E.g. a file caught mid-write: treat it as failed so the last good version is kept.
+        return None, ValueError("no data rows")
+    return df, None
+
+def load_csv_files(csv_files, workers=1, engine="c"):
+    """
+    Loads the given CSV files using load_csv_with_location.
+    workers: number of processes to read files with (1 loads serially, None uses all CPUs).
+    engine: pandas CSV engine ("c", "python", "pyarrow" or "auto").
+    Returns a dict mapping each successfully loaded file path to its DataFrame, in input order.
+    """
+    if workers == 1 or len(csv_files) <= 1:
+        results = [_load_csv_safe(file, engine) for file in csv_files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_load_csv_safe, csv_files, [engine] * len(csv_files)))
+    loaded = {}
+    for file, (df, error) in zip(csv_files, results):
+        if error is not None:
+            print(f"Error loading {file}: {error}")
+            continue
+        print(f"Loaded {file}: columns: {df.columns.tolist()}")
+        loaded[file] = df
+    return loaded
+
+def list_csv_files(data_dir="data"):
+    """Returns the sorted paths of all CSV files in the given directory."""
+    return sorted(os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith(".csv"))
+
+def load_all_csv(data_dir="data", workers=1, engine="c"):
     """
     Loads all CSV files from the given directory using the above helper.
-    Returns a list of DataFrames.
+    Returns a list of DataFrames in file-name order.
     """
-    csv_files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith(".csv")]
-    dfs = []
-    for file in csv_files:
-        try:
-            df = load_csv_with_location(file)
-            print(f"Loaded {file}: columns: {df.columns.tolist()}")
-            dfs.append(df)
-        except Exception as e:
-            print(f"Error loading {file}: {e}")
-    return dfs
+    return list(load_csv_files(list_csv_files(data_dir), workers=workers, engine=engine).values())
 
-def merge_by_location(dfs):
+def _align_stream(series, grid, freq, how, tolerance=None):
+    """
+    Snaps one measurement stream (a Series indexed by DateTime) onto the time grid.
+    how: a resample aggregation ("mean", "median", "last", "first", "max", "min")
+    or "asof" to take the latest observation at or before each grid point within tolerance.
+    """
+    if how == "asof":
+        left = pd.DataFrame({"DateTime": grid})
+        right = series.rename("value").rename_axis("DateTime").reset_index()
+        joined = pd.merge_asof(left, right, on="DateTime", direction="backward",
+                               tolerance=pd.Timedelta(tolerance or freq))
+        return pd.Series(joined["value"].to_numpy(), index=grid, name=series.name)
+    # Bin from the grid's first point: the default (start of day) only matches the grid
+    # when freq divides a day evenly.
+    return series.resample(freq, origin=grid[0]).agg(how)
+
+def align_streams(dfs, freq=DEFAULT_FREQ, agg="mean", tolerance=None):
+    """
+    Aligns the measurement streams of one location onto a regular time grid in a single pass.
+    dfs: DataFrames with DateTime, Location and one measurement column each.
+      Frames sharing a measurement column (e.g. monthly files of the same sensor) are stacked first.
+    freq: grid spacing (any pandas offset alias, e.g. "15min", "1h").
+    agg: aggregation applied to samples falling in a grid cell, either one name for every stream
+      or a dict mapping measurement columns to names (unlisted columns use "mean").
+      See _align_stream for the supported names.
+    tolerance: as-of lookback window for "asof" streams (defaults to freq).
+    Returns a DataFrame with DateTime, Location and one column per stream. Grid cells without a sample
+    are left missing, so the stored partitions record which values were observed; gaps are filled
+    when a frame is prepared for simulation (see data_access.prepare_simulation_frame).
+    """
+    location = dfs[0]["Location"].iloc[0]
+    pieces = {}
+    for df in dfs:
+        col = df.columns[-1]
+        pieces.setdefault(col, []).append(df.set_index("DateTime")[col])
+    
+    streams = {}
+    for col, parts in pieces.items():
+        series = pd.concat(parts) if len(parts) > 1 else parts[0]
+        series = series[series.index.notna()].sort_index()
+        streams[col] = series[~series.index.duplicated(keep="last")]
+    
+    starts = [s.index[0] for s in streams.values() if len(s)]
+    ends = [s.index[-1] for s in streams.values() if len(s)]
+    if not starts:
+        return pd.DataFrame(columns=["DateTime", "Location"] + list(streams))
+    grid = pd.date_range(min(starts).floor(freq), max(ends).floor(freq), freq=freq, name="DateTime")
+    
+    aligned = []
+    for col, series in streams.items():
+        how = agg.get(col, "mean") if isinstance(agg, dict) else agg
+        aligned.append(_align_stream(series, grid, freq, how, tolerance))
+    merged_df = pd.concat(aligned, axis=1).reindex(grid)
+    lost = [col for col, series in streams.items() if series.notna().any() and merged_df[col].isna().all()]
+    if lost:
+        print(f"Warning: no values of {lost} landed on the {freq} grid of {location}")
+    merged_df.insert(0, "Location", location)
+    return merged_df.reset_index()
+
+def merge_by_location(dfs, freq=DEFAULT_FREQ, agg="mean", tolerance=None):
     """
     Groups the list of DataFrames by their Location value,
-    then merges (outer join) all DataFrames in each group on ["DateTime", "Location"].
-    Finally, sorts each merged DataFrame by DateTime and interpolates numeric columns.
+    then aligns all DataFrames in each group onto a common time grid (see align_streams).
     Returns a dictionary mapping location names to merged DataFrames.
     """
     groups = {}
@@ -110,30 +277,148 @@ def merge_by_location(dfs):
     
     merged_by_location = {}
     for loc, group in groups.items():
-        merged_df = group[0]
-        for df in group[1:]:
-            merged_df = pd.merge(merged_df, df, on=["DateTime", "Location"], how="outer")
-        merged_df = merged_df.sort_values("DateTime")
-        merged_df = merged_df.set_index("DateTime").interpolate(method="time").reset_index()
-        merged_by_location[loc] = merged_df
+        merged_by_location[loc] = align_streams(group, freq=freq, agg=agg, tolerance=tolerance)
     return merged_by_location
 
-if __name__ == "__main__":
-    # Load all CSV files from the 'data' folder.
-    dfs = load_all_csv(data_dir="data")
-    if not dfs:
-        raise ValueError("No CSV files loaded. Check the data directory.")
+def file_sha256(file_path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def find_changed_files(csv_files, manifest):
+    """
+    Compares the CSV files on disk with the manifest of processed files.
+    A file whose size and mtime match its manifest entry is assumed unchanged without hashing;
+    otherwise its content hash decides (a touched but identical file is not reprocessed).
+    Returns (changed, current, removed):
+      - changed: paths of new or modified files,
+      - current: manifest entries for every file on disk (hash filled in for changed files),
+      - removed: manifest entries of files that no longer exist.
+    """
+    changed = []
+    current = {}
+    for file in csv_files:
+        name = os.path.basename(file)
+        stat = os.stat(file)
+        entry = {
+            "path": file,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "location": get_location_from_filename(file),
+        }
+        previous = manifest.get(name)
+        if previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+            entry["sha256"] = previous["sha256"]
+        else:
+            entry["sha256"] = file_sha256(file)
+            if not previous or previous["sha256"] != entry["sha256"]:
+                changed.append(file)
+        current[name] = entry
+    removed = {name: entry for name, entry in manifest.items() if name not in current}
+    return changed, current, removed
+
+def update_store(data_dir="data", store_dir=DEFAULT_STORE_DIR, workers=1, engine="c", full=False,
+                 freq=DEFAULT_FREQ, agg="mean", tolerance=None):
+    """
+    Incrementally updates the merged store from the CSV files in data_dir.
+    Only new or changed files are parsed; their parsed frames are cached by content hash.
+    Each affected location is then re-merged from the cached frames of all its files
+    and its partition rewritten; unaffected partitions are left untouched.
+    full: reprocess every file and rewrite every partition. This is implied when the
+      merge settings (freq, agg, tolerance) differ from those the store was built with.
+      Partitions of locations without source files and unreferenced cached frames are removed.
+    A file that fails to load keeps its previous manifest entry (and cached frame), so its
+    location is still merged with the last good version until the file loads again.
+    Returns (merged_by_location, removed_locations):
+      - merged_by_location: dict mapping each rewritten location to its merged DataFrame,
+      - removed_locations: sorted list of locations whose partition was deleted.
+    """
+    csv_files = list_csv_files(data_dir)
+    if not csv_files:
+        raise ValueError("No CSV files found. Check the data directory.")
+    # interpolated: partitions built before gaps were left to prepare_simulation_frame were
+    # interpolated in place; the changed settings make them rebuild.
+    settings = {"freq": freq, "agg": agg, "tolerance": tolerance, "interpolated": False}
+    if load_manifest_settings(store_dir) != settings:
+        full = True
+    manifest = load_manifest(store_dir)
+    changed, current, removed = find_changed_files(csv_files, {} if full else manifest)
+    if full:
+        removed = {name: entry for name, entry in manifest.items() if name not in current}
     
-    # Merge DataFrames for each location.
-    merged_by_location = merge_by_location(dfs)
+    loaded = load_csv_files(changed, workers=workers, engine=engine)
+    for file in changed:
+        if file not in loaded:
+            name = os.path.basename(file)
+            # Fall back to the last good version; its stale size/mtime make the file retried next run.
+            if name in manifest:
+                current[name] = manifest[name]
+            else:
+                del current[name]
+    frames_by_hash = {}
+    for file, df in loaded.items():
+        sha256 = current[os.path.basename(file)]["sha256"]
+        write_file_cache(store_dir, sha256, df)
+        frames_by_hash[sha256] = df
     
-    # Concatenate all location-specific DataFrames into one.
-    merged_all = pd.concat(merged_by_location.values(), ignore_index=True)
+    affected = {current[os.path.basename(file)]["location"] for file in loaded}
+    affected |= {entry["location"] for entry in removed.values()}
+    if full:
+        affected |= set(list_locations(store_dir))
+    
+    merged_by_location = {}
+    removed_locations = []
+    for loc in sorted(affected):
+        entries = [entry for entry in current.values() if entry["location"] == loc]
+        if not entries:
+            remove_location(store_dir, loc)
+            removed_locations.append(loc)
+            continue
+        dfs = [frames_by_hash[e["sha256"]] if e["sha256"] in frames_by_hash else read_file_cache(store_dir, e["sha256"])
+               for e in entries]
+        merged_df = merge_by_location(dfs, freq=freq, agg=agg, tolerance=tolerance)[loc]
+        write_location(store_dir, loc, merged_df)
+        merged_by_location[loc] = merged_df
+    
+    save_manifest(store_dir, current, settings=settings)
+    # Drop cached frames of files that were removed or replaced by new contents.
+    live_hashes = {entry["sha256"] for entry in current.values()}
+    for sha256 in list_file_cache(store_dir):
+        if sha256 not in live_hashes:
+            remove_file_cache(store_dir, sha256)
+    return merged_by_location, removed_locations
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge raw sensor CSV files by location.")
+    parser.add_argument("--data-dir", default="data", help="Directory containing the raw CSV files.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of processes used to read files (default: all CPUs, 1 = serial).")
+    parser.add_argument("--engine", default="auto", choices=["auto", "c", "python", "pyarrow"],
+                        help="pandas CSV engine; 'auto' uses pyarrow when it is installed.")
+    parser.add_argument("--output", default=DEFAULT_STORE_DIR,
+                        help="Directory of the Parquet store, partitioned by Location.")
+    parser.add_argument("--full", action="store_true",
+                        help="Reprocess every file instead of only new or changed ones.")
+    parser.add_argument("--freq", default=DEFAULT_FREQ,
+                        help="Spacing of the per-location time grid (pandas offset alias, e.g. 15min, 1h).")
+    parser.add_argument("--agg", default="mean", choices=["mean", "median", "last", "first", "max", "min", "asof"],
+                        help="How samples within a grid cell are combined.")
+    args = parser.parse_args()
     
-    # Save the merged data to a CSV file.
-    merged_all.to_csv("merged_data.csv", index=False)
-    print("Merged data saved to merged_data.csv")
+    # Parse new or changed CSV files and re-merge only the locations they belong to.
+    merged_by_location, removed_locations = update_store(data_dir=args.data_dir, store_dir=args.output,
+                                                         workers=args.workers, engine=args.engine,
+                                                         full=args.full, freq=args.freq, agg=args.agg)
+    if not merged_by_location and not removed_locations:
+        print(f"No locations needed re-merging; {args.output}/ is up to date.")
+    elif merged_by_location:
+        print(f"Merged data saved to {args.output}/")
     
-    # Optional: print a summary per location.
+    # Optional: print a summary per updated or removed location.
     for loc, df in merged_by_location.items():
         print(f"Location: {loc}, shape: {df.shape}")
+    for loc in removed_locations:
+        print(f"Location: {loc}, removed from {args.output}/ (no source files left)")
@@ -0,0 +1,168 @@
+# data_access.py
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from correlation import CorrelationEngine
+from downsampling import build_pyramid
+from storage import DEFAULT_STORE_DIR, list_columns, list_locations, location_path, read_location
+
+# A simulation-ready frame plus a sparse boolean mask of the cells that were filled in.
+PreparedFrame = namedtuple("PreparedFrame", ["data", "gap_mask", "sensor_cols"])
+
+def sensor_columns(df):
+    """Returns the measurement columns of a merged frame (everything except DateTime and Location)."""
+    return [col for col in df.columns if col not in ["DateTime", "Location"]]
+
+def float32_safe(values, tolerance=1e-4):
+    """
+    Returns True if a float column can be stored as float32: the rounding error is at most
+    tolerance times the column's standard deviation (or zero for constant columns).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return True
+    error = np.abs(finite.astype(np.float32).astype(np.float64) - finite).max()
+    return error <= tolerance * finite.std()
+
+def compact_frame(df, tolerance=1e-4):
+    """
+    Returns a copy of a location frame using less memory: float64 sensor columns become
+    float32 where float32_safe allows it and an object Location column becomes categorical.
+    """
+    converted = {}
+    for col in sensor_columns(df):
+        if df[col].dtype == np.float64 and float32_safe(df[col].to_numpy(), tolerance):
+            converted[col] = df[col].astype(np.float32)
+    if "Location" in df.columns and df["Location"].dtype == object:
+        converted["Location"] = df["Location"].astype("category")
+    return df.assign(**converted) if converted else df
+
+def frame_memory(df):
+    """Returns the memory used by a DataFrame in bytes, including object contents."""
+    return int(df.memory_usage(deep=True).sum())
+
+def prepare_simulation_frame(df, sensors=None):
+    """
+    Builds the simulation-ready version of a location frame: DateTime plus sensor columns,
+    with gaps interpolated in time and leading/trailing gaps filled from the nearest value.
+    Merged partitions keep only observed values (see align_streams), so the returned PreparedFrame's
+    gap_mask (indexed by DateTime) marks every cell that was filled in rather than measured;
+    the mask is sparse, so it only stores the missing cells.
+    """
+    sensors = sensor_columns(df) if sensors is None else sensors
+    sim = df[["DateTime"] + sensors].set_index("DateTime")
+    gap_mask = sim.isna().astype(pd.SparseDtype(bool, False))
+    sim = sim.interpolate(method="time").ffill().bfill()
+    return PreparedFrame(sim.reset_index(), gap_mask, sensors)
+
+def count_gaps(gap_mask):
+    """
+    Returns the number of cells set in a sparse gap mask. (DataFrame.sum on a sparse bool frame
+    returns one boolean per column rather than a count.)
+    """
+    return int(sum(np.count_nonzero(gap_mask[col].array.sp_values) for col in gap_mask.columns))
+
+class SensorDataIndex:
+    """
+    Location -> frame index over the merged Parquet store.
+    Each location is read once, with its all-NaN columns dropped and the rest compacted
+    (see compact_frame), and its simulation-ready
+    frame is prepared once, so page reruns only pay for a dictionary lookup.
+    Metric charts only need one sensor: columns() reads the partition's Parquet footer and
+    pyramid() reads just that column, so they never load the whole partition.
+    Everything cached for a location is dropped when its partition file changes on disk.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self._frames = {}
+        self._prepared = {}
+        self._correlations = {}
+        self._pyramids = {}
+        self._columns = {}
+        self._mtimes = {}
+        self._lock = threading.Lock()
+
+    def locations(self):
+        """Returns the locations available in the store."""
+        return list_locations(self.store_dir)
+
+    def _refresh(self, location):
+        mtime = os.path.getmtime(location_path(self.store_dir, location))
+        if self._mtimes.get(location) != mtime:
+            for cache in (self._frames, self._prepared, self._correlations, self._pyramids, self._columns):
+                cache.pop(location, None)
+            self._mtimes[location] = mtime
+
+    def _frame(self, location):
+        self._refresh(location)
+        if location not in self._frames:
+            df = read_location(self.store_dir, location)
+            empty = [col for col in sensor_columns(df) if df[col].isna().all()]
+            self._frames[location] = compact_frame(df.drop(columns=empty))
+        return self._frames[location]
+
+    def frame(self, location):
+        """Returns the merged frame (DateTime, Location and non-empty sensor columns) of a location."""
+        with self._lock:
+            return self._frame(location)
+
+    def columns(self, location):
+        """
+        Returns the sensor columns stored for a location, read from the Parquet footer only
+        (unlike sensor_columns, columns without any data are included).
+        """
+        with self._lock:
+            self._refresh(location)
+            if location not in self._columns:
+                self._columns[location] = list_columns(self.store_dir, location)
+            return self._columns[location]
+
+    def sensor_columns(self, location):
+        """Returns the non-empty sensor columns of a location."""
+        return sensor_columns(self.frame(location))
+
+    def prepared(self, location):
+        """Returns the cached PreparedFrame (interpolated data and gap mask) of a location."""
+        with self._lock:
+            df = self._frame(location)
+            if location not in self._prepared:
+                self._prepared[location] = prepare_simulation_frame(df)
+            return self._prepared[location]
+
+    def correlation(self, location):
+        """Returns the cached CorrelationEngine (per-day sufficient statistics) over a location's sensor columns."""
+        with self._lock:
+            df = self._frame(location)
+            if location not in self._correlations:
+                self._correlations[location] = CorrelationEngine(df, columns=sensor_columns(df))
+            return self._correlations[location]
+
+    def pyramid(self, location, metric):
+        """
+        Returns the cached min/max/mean pyramid (see build_pyramid) of one sensor column of a location,
+        built from that column alone.
+        """
+        with self._lock:
+            self._refresh(location)
+            pyramids = self._pyramids.setdefault(location, {})
+            if metric not in pyramids:
+                df = read_location(self.store_dir, location, columns=[metric])
+                pyramids[metric] = build_pyramid(df, columns=[metric])
+            return pyramids[metric]
+
+    def memory_usage(self):
+        """Returns the bytes held per loaded location (merged frame plus prepared frame and gap mask)."""
+        with self._lock:
+            usage = {}
+            for location, df in self._frames.items():
+                usage[location] = frame_memory(df)
+                if location in self._prepared:
+                    prepared = self._prepared[location]
+                    usage[location] += frame_memory(prepared.data) + frame_memory(prepared.gap_mask)
+            return usage
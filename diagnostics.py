@@ -0,0 +1,164 @@
+# diagnostics.py
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+# Set SIMULAD_DIAGNOSTICS=0 to turn span recording off.
+DIAGNOSTICS_ENABLED = os.environ.get("SIMULAD_DIAGNOSTICS", "1") != "0"
+
+# Optional export targets, written after every app rerun (see export_from_env).
+SPANS_FILE = os.environ.get("SIMULAD_SPANS_FILE")
+METRICS_FILE = os.environ.get("SIMULAD_METRICS_FILE")
+
+MAX_SPANS = 5000
+
+_spans = deque(maxlen=MAX_SPANS)
+# Cumulative per-span count, total and max seconds since the process started (Prometheus counters).
+_totals = {}
+_lock = threading.Lock()
+_context = threading.local()
+
+def set_run(run_id):
+    """Tags the spans subsequently recorded by this thread with run_id (e.g. one Streamlit rerun)."""
+    _context.run = run_id
+
+def current_run():
+    """Returns the run id of this thread, or None."""
+    return getattr(_context, "run", None)
+
+def record_span(name, duration, start=None, **attrs):
+    """Records a finished span of duration seconds."""
+    if not DIAGNOSTICS_ENABLED:
+        return
+    entry = {
+        "name": name,
+        "start": start if start is not None else time.time() - duration,
+        "duration": duration,
+        "run": current_run(),
+        "thread": threading.current_thread().name,
+    }
+    if attrs:
+        entry["attrs"] = attrs
+    with _lock:
+        _spans.append(entry)
+        count, total, longest = _totals.get(name, (0, 0.0, 0.0))
+        _totals[name] = (count + 1, total + duration, max(longest, duration))
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the enclosed block and records it as a span named name.
+    attrs are stored with the span (e.g. location=...); a span left by an exception gets its type as "error".
+    """
+    if not DIAGNOSTICS_ENABLED:
+        yield
+        return
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start, start=start_wall, **attrs)
+
+def timed(name):
+    """Decorator recording every call of the function as a span named name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_spans(run=None):
+    """Returns the recorded spans (at most MAX_SPANS, oldest first), optionally only those of one run."""
+    with _lock:
+        spans = list(_spans)
+    return spans if run is None else [s for s in spans if s["run"] == run]
+
+def summarize(spans):
+    """Returns per-name count, total, mean and max seconds of spans, slowest total first."""
+    stats = {}
+    for s in spans:
+        count, total, longest = stats.get(s["name"], (0, 0.0, 0.0))
+        stats[s["name"]] = (count + 1, total + s["duration"], max(longest, s["duration"]))
+    rows = [{"span": name, "count": count, "total_s": total, "mean_s": total / count, "max_s": longest}
+            for name, (count, total, longest) in stats.items()]
+    return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+def get_totals():
+    """Returns the cumulative (count, total seconds, max seconds) per span name since the process started."""
+    with _lock:
+        return dict(_totals)
+
+def clear_spans():
+    """Forgets the recorded spans and cumulative totals."""
+    with _lock:
+        _spans.clear()
+        _totals.clear()
+
+def to_jsonl(spans):
+    """Returns spans as JSON lines."""
+    return "".join(json.dumps(s, default=str) + "\n" for s in spans)
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def to_prometheus(prefix="simulad"):
+    """Returns the cumulative span totals in the Prometheus text exposition format."""
+    totals = get_totals()
+    metric = f"{prefix}_span_seconds"
+    lines = [f"# HELP {metric} Time spent in SimuLad pipeline stages.", f"# TYPE {metric} summary"]
+    for name, (count, total, _) in sorted(totals.items()):
+        lines.append(f'{metric}_count{{span="{_label(name)}"}} {count}')
+        lines.append(f'{metric}_sum{{span="{_label(name)}"}} {total:.6f}')
+    lines += [f"# HELP {prefix}_span_max_seconds Longest single span since start.",
+              f"# TYPE {prefix}_span_max_seconds gauge"]
+    for name, (_, _, longest) in sorted(totals.items()):
+        lines.append(f'{prefix}_span_max_seconds{{span="{_label(name)}"}} {longest:.6f}')
+    return "\n".join(lines) + "\n"
+
+def export_jsonl(path, spans):
+    """Appends spans to a JSON lines file."""
+    with open(path, "a") as f:
+        f.write(to_jsonl(spans))
+
+def export_prometheus(path, prefix="simulad"):
+    """Writes the Prometheus text file atomically (e.g. for node_exporter's textfile collector)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(to_prometheus(prefix))
+    os.replace(tmp_path, path)
+
+def export_from_env(spans):
+    """Exports spans to SIMULAD_SPANS_FILE and the totals to SIMULAD_METRICS_FILE, when set."""
+    if SPANS_FILE and spans:
+        export_jsonl(SPANS_FILE, spans)
+    if METRICS_FILE:
+        export_prometheus(METRICS_FILE)
+
+def start_profile():
+    """Starts and returns a cProfile profiler for the calling thread, or None if another profiler is active."""
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+def profile_report(profile, limit=30, sort="cumulative"):
+    """Stops the profiler and returns its top `limit` functions by `sort` as text."""
+    profile.disable()
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
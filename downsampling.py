@@ -0,0 +1,103 @@
+# downsampling.py
+import numpy as np
+
+# Resolutions of the min/max/mean pyramid, finest first.
+PYRAMID_LEVELS = ["15min", "1h", "6h", "1D"]
+
+def build_pyramid(df, columns=None, levels=PYRAMID_LEVELS):
+    """
+    Precomputes a min/max/mean pyramid for the sensor columns of a DataFrame.
+    df: DataFrame with a DateTime column.
+    columns: sensor columns to include (default: all except DateTime and Location).
+    Returns a dict mapping each level to a DataFrame indexed by DateTime
+    with (column, stat) MultiIndex columns, stat being "min", "max" or "mean".
+    """
+    if columns is None:
+        columns = [col for col in df.columns if col not in ["DateTime", "Location"]]
+    indexed = df.set_index("DateTime")[columns]
+    pyramid = {}
+    for level in levels:
+        agg = indexed.resample(level).agg(["min", "max", "mean"])
+        pyramid[level] = agg.dropna(how="all")
+    return pyramid
+
+def choose_level(pyramid, start, end, max_points):
+    """
+    Picks the finest pyramid level that has at most max_points buckets between start and end.
+    Falls back to the coarsest level when even that one is too dense.
+    """
+    for level, frame in pyramid.items():
+        if frame.loc[start:end].shape[0] <= max_points:
+            return level
+    return list(pyramid)[-1]
+
+def minmax_downsample(x, y, n_out):
+    """
+    Reduces a series to about n_out points by keeping the minimum and maximum of each
+    of n_out // 2 equal-count buckets, in time order, so spikes are never dropped.
+    Returns the selected indices into x/y.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(int)
+    indices = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        bucket = y[lo:hi]
+        if not np.isfinite(bucket).any():
+            continue
+        pair = sorted({lo + int(np.nanargmin(bucket)), lo + int(np.nanargmax(bucket))})
+        indices.extend(pair)
+    return np.asarray(indices, dtype=int)
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    x: numeric positions (e.g. timestamps as int64), y: values, both without NaNs.
+    Keeps the first and last points and, from each of n_out - 2 buckets, the point forming
+    the largest triangle with the previously kept point and the next bucket's average,
+    which preserves the visual shape of the line.
+    Returns the selected indices into x/y.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+def downsample_for_chart(pyramid, column, start, end, max_points, method="lttb"):
+    """
+    Returns the points to draw for one column over [start, end] at about max_points resolution.
+    The finest pyramid level that fits is chosen first; if even the coarsest level is too dense
+    (very long ranges), its mean line is thinned further with LTTB or min-max bucketing.
+    Returns (level, DataFrame with DateTime, min, max and mean columns).
+    """
+    level = choose_level(pyramid, start, end, max_points)
+    frame = pyramid[level][column].loc[start:end].dropna(subset=["mean"])
+    if len(frame) > max_points:
+        x = frame.index.asi8
+        y = frame["mean"].to_numpy()
+        if method == "minmax":
+            keep = minmax_downsample(x, y, max_points)
+        else:
+            keep = lttb(x, y, max_points)
+        frame = frame.iloc[keep]
+    return level, frame.rename_axis("DateTime").reset_index()
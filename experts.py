@@ -1,44 +1,126 @@
-import datetime
-from ai_integration import generate_summary
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from ai_integration import generate_summary, stream_summary
+from conversation_store import ConversationStore
+from diagnostics import current_run, set_run
 
-conversation_log = []
+# Log used when no per-session store is passed (e.g. scripts and notebooks).
+_default_store = None
 
-def add_expert_message(expert, message):
-    """Adds a message from an expert to the conversation log."""
-    conversation_log.append({
-        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "expert": expert,
-        "message": message
-    })
+# Default number of expert prompts sent to Ollama at once; match the server's OLLAMA_NUM_PARALLEL.
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
 
-def generate_expert_response(expert, context, data_summary=None, model_choice="phi3"):
+# The experts taking part in a discussion: (expert, opening remark, context for the LLM).
+EXPERT_PANEL = [
+    ("Temperature Expert",
+     "Based on the latest sensor data, I observe a subtle upward trend in temperature.",
+     "Temperature Expert: I observe a subtle upward trend in temperature that could affect other variables. "
+     "Please provide an in-depth analysis of the potential impacts on the ecosystem."),
+    ("Humidity Expert",
+     "Based on the temperature trends, I expect corresponding changes in humidity levels.",
+     "Humidity Expert: Considering the observed temperature trends and their potential influence on moisture, "
+     "please analyze how humidity levels might change and suggest actionable recommendations."),
+    ("Wind Speed Expert",
+     "Observations indicate fluctuations in wind speed which may affect dispersion patterns.",
+     "Wind Speed Expert: Given the variability in wind speed from the dataset, please evaluate how these fluctuations "
+     "might influence overall ecosystem dynamics, particularly pollutant dispersion or microclimate effects."),
+]
+
+def get_default_store():
+    """Returns the conversation store used when none is given, creating it on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ConversationStore("default")
+    return _default_store
+
+def add_expert_message(expert, message, store=None):
+    """Adds a message from an expert to the conversation log (store defaults to the shared default log)."""
+    return (store or get_default_store()).add(expert, message)
+
+def build_expert_prompt(expert, context, data_summary=None):
     """
-    Generates an expert response using the local LLM.
-    
+    Builds the prompt for an expert.
     If a non-empty data_summary is provided, it will be included in the prompt.
     Otherwise, only the context is provided.
     The prompt instructs the model to produce a detailed and actionable analysis.
     """
     if data_summary and data_summary.strip():
-        prompt = (
+        return (
             f"You are {expert}, a seasoned expert in environmental sensor data analysis. "
             "Based on the following summarized data and context, provide a detailed, actionable analysis and forecast. "
             f"Data Summary: {data_summary}\n"
             f"Context: {context}\n\n"
             "Provide your expert analysis:"
         )
-    else:
-        prompt = (
-            f"You are {expert}, a seasoned expert in environmental sensor data analysis. "
-            "Based on the following context, provide a detailed, actionable, and specific forecast and analysis. "
-            "Do not include generic placeholders or incomplete ranges. "
-            f"Context: {context}\n\n"
-            "Provide your expert analysis:"
-        )
+    return (
+        f"You are {expert}, a seasoned expert in environmental sensor data analysis. "
+        "Based on the following context, provide a detailed, actionable, and specific forecast and analysis. "
+        "Do not include generic placeholders or incomplete ranges. "
+        f"Context: {context}\n\n"
+        "Provide your expert analysis:"
+    )
+
+def generate_expert_response(expert, context, data_summary=None, model_choice="phi3", store=None):
+    """
+    Generates an expert response using the local LLM (see build_expert_prompt)
+    and adds it to the conversation log.
+    """
+    prompt = build_expert_prompt(expert, context, data_summary)
     response = generate_summary(prompt, model=model_choice)
-    add_expert_message(expert, response)
+    add_expert_message(expert, response, store)
     return response
 
-def get_conversation_log():
-    """Returns the conversation log."""
-    return conversation_log
+def stream_expert_discussion(panel=EXPERT_PANEL, data_summary=None, model_choice="phi3",
+                             max_concurrency=DEFAULT_MAX_CONCURRENCY, store=None):
+    """
+    Runs a discussion among the experts of a panel, sending their independent prompts
+    to the LLM concurrently on at most max_concurrency threads.
+    Yields (index, chunk) events as partial responses arrive, index being the expert's position in the panel.
+    Once every response is complete, each expert's opening remark and response are appended
+    to the conversation log in panel order, so the log does not depend on which model call finished first.
+    """
+    events = queue.Queue()
+    run_id = current_run()
+
+    def run(index, expert, context):
+        # Attribute the LLM spans of the worker threads to the caller's run.
+        set_run(run_id)
+        try:
+            for chunk in stream_summary(build_expert_prompt(expert, context, data_summary), model=model_choice):
+                events.put((index, chunk))
+        except Exception as e:
+            events.put((index, f"Error generating summary: {e}"))
+        finally:
+            events.put((index, None))
+
+    responses = [[] for _ in panel]
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        for index, (expert, _, context) in enumerate(panel):
+            executor.submit(run, index, expert, context)
+        remaining = len(panel)
+        while remaining:
+            index, chunk = events.get()
+            if chunk is None:
+                remaining -= 1
+                continue
+            responses[index].append(chunk)
+            yield index, chunk
+
+    for (expert, opening, _), chunks in zip(panel, responses):
+        add_expert_message(expert, opening, store)
+        add_expert_message(expert, "".join(chunks).strip(), store)
+
+def generate_expert_discussion(panel=EXPERT_PANEL, data_summary=None, model_choice="phi3",
+                               max_concurrency=DEFAULT_MAX_CONCURRENCY, store=None):
+    """
+    Runs stream_expert_discussion to completion and returns the experts' responses in panel order.
+    """
+    responses = [""] * len(panel)
+    for index, chunk in stream_expert_discussion(panel, data_summary, model_choice, max_concurrency, store):
+        responses[index] += chunk
+    return [response.strip() for response in responses]
+
+def get_conversation_log(store=None):
+    """Returns the most recent entries of the conversation log (bounded by the store's ring buffer)."""
+    return (store or get_default_store()).recent()
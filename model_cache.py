@@ -0,0 +1,120 @@
+# model_cache.py
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(".simulad_cache", "models")
+
+def data_fingerprint(data):
+    """
+    Returns a short hash of a Series or DataFrame's index and values.
+    Any change to the training data (new rows, edited values) gives a new fingerprint.
+    """
+    hashed = pd.util.hash_pandas_object(data, index=True).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:32]
+
+def make_key(location, column, model_type, params, fingerprint):
+    """
+    Builds a cache key from the forecast inputs.
+    params: JSON-serializable hyperparameters (e.g. {"order": [1, 1, 1]}).
+    """
+    payload = json.dumps([location, column, model_type, params, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ModelCache:
+    """
+    Two-tier cache of fitted models.
+    The memory tier is an LRU of at most max_memory_items objects; the disk tier stores pickles
+    in cache_dir and evicts the least recently used files once they exceed max_disk_bytes.
+    Set cache_dir to None for a memory-only cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_items=32, max_disk_bytes=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached object for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if self.cache_dir and os.path.exists(self._path(key)):
+                try:
+                    with open(self._path(key), "rb") as f:
+                        value = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    value = None
+                if value is not None:
+                    try:
+                        os.utime(self._path(key))  # Mark as recently used for disk eviction.
+                    except FileNotFoundError:
+                        pass
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Stores an object in both tiers, then enforces the disk size limit."""
+        with self._lock:
+            self._remember(key, value)
+            if not self.cache_dir:
+                return
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Other processes may share the directory, so files can vanish between listing and removal.
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir:
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith(".pkl"):
+                        os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,71 @@
+# ollama_client.py
+import os
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def default_base_url():
+    """
+    Returns the Ollama server URL, honouring OLLAMA_HOST like the ollama CLI does
+    (e.g. "127.0.0.1:11434" or "http://gpu-box:11434").
+    """
+    host = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+class OllamaClient:
+    """
+    Client for the local Ollama HTTP API.
+    A single requests.Session keeps pooled keep-alive connections to the server, so prompts
+    do not pay for process spawn or CLI startup, and keep_alive tells Ollama how long to keep
+    the model loaded between calls (e.g. "10m", or -1 to keep it loaded indefinitely).
+    timeout: (connect, read) seconds; the read timeout applies between streamed chunks.
+    retries: attempts on connection errors and 502/503/504 responses, with exponential backoff.
+    """
+
+    def __init__(self, base_url=None, timeout=(3.05, 300), retries=2, keep_alive="10m", pool_size=4):
+        self.base_url = (base_url or default_base_url()).rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=0, backoff_factor=0.5,
+                      status_forcelist=(502, 503, 504), allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, model, prompt, stream, options):
+        payload = {"model": model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        return payload
+
+    def generate(self, model, prompt, options=None):
+        """Returns the full completion for a prompt."""
+        response = self.session.post(f"{self.base_url}/api/generate",
+                                     json=self._payload(model, prompt, False, options), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["response"]
+
+    def stream(self, model, prompt, options=None):
+        """Yields the completion for a prompt in chunks as the server produces them."""
+        with self.session.post(f"{self.base_url}/api/generate", json=self._payload(model, prompt, True, options),
+                               timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise requests.HTTPError(chunk["error"], response=response)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
@@ -0,0 +1,118 @@
+# ollama_stub.py
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": name} for name in self.server.models]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests.append(request)
+        model = request.get("model", "")
+        text = self.server.reply(model, request.get("prompt", ""))
+        time.sleep(self.server.latency)
+        if not request.get("stream", True):
+            self._send_json(200, {"model": model, "response": text, "done": True})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in re.findall(r"\S+\s*", text):
+            time.sleep(self.server.token_delay)
+            self._write_chunk({"model": model, "response": token, "done": False})
+        self._write_chunk({"model": model, "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, body):
+        data = json.dumps(body).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def _echo_reply(model, prompt):
+    return f"[{model}] Stub analysis of {len(prompt)} prompt characters: conditions are stable."
+
+class StubOllamaServer:
+    """
+    In-process stand-in for the Ollama HTTP API (/api/generate and /api/tags) for tests and benchmarks.
+    reply: function (model, prompt) -> completion text.
+    latency: seconds to wait before answering; token_delay: seconds between streamed tokens.
+    Received request payloads are recorded in .requests. Use as a context manager, then point
+    OllamaClient (or OLLAMA_HOST) at .url.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, reply=_echo_reply, latency=0.0, token_delay=0.0,
+                 models=("phi3",)):
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.reply = reply
+        self.httpd.latency = latency
+        self.httpd.token_delay = token_delay
+        self.httpd.models = list(models)
+        self.httpd.requests = []
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # shutdown() waits for serve_forever to exit, so it would block if the server never started.
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server that returns canned completions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens.")
+    args = parser.parse_args()
+    server = StubOllamaServer(args.host, args.port, latency=args.latency, token_delay=args.token_delay)
+    print(f"Stub Ollama server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -0,0 +1,56 @@
+# parallel.py
+import os
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from model_cache import ModelCache
+from var_registry import VARRegistry
+
+# Per-process caches used by pool workers (the memory tiers cannot be shared across processes).
+_worker_cache = None
+_worker_registry = None
+
+def worker_cache(cache_dir):
+    """
+    Returns this process's ModelCache over cache_dir, reused by every task the worker runs,
+    or None when cache_dir is None.
+    """
+    global _worker_cache
+    if not cache_dir:
+        return None
+    if _worker_cache is None or _worker_cache.cache_dir != cache_dir:
+        _worker_cache = ModelCache(cache_dir)
+    return _worker_cache
+
+def worker_registry(registry_dir):
+    """Returns this process's VARRegistry over registry_dir (memory-only when None), reused across tasks."""
+    global _worker_registry
+    if _worker_registry is None or _worker_registry.registry_dir != registry_dir:
+        _worker_registry = VARRegistry(registry_dir)
+    return _worker_registry
+
+def run_bounded(fn, tasks, workers=None, max_pending=None):
+    """
+    Runs fn(*args) for every args tuple of tasks on a process pool.
+    workers: number of processes (None uses all CPUs).
+    max_pending: maximum number of tasks queued in the pool at once (default 2 * workers),
+      which bounds the memory held by pending task arguments.
+    Returns the results in task order.
+    """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 2 * workers
+    results = [None] * len(tasks)
+    # Spawned workers avoid forking a multithreaded parent such as the Streamlit server.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = {}
+        for i, args in enumerate(tasks):
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            future = executor.submit(fn, *args)
+            pending[future] = i
+        for future in pending:
+            results[pending[future]] = future.result()
+    return results
@@ -1,28 +1,86 @@
 # simulation.py
+import hashlib
+import itertools
+from collections import namedtuple
+
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.api import VAR
+
+from diagnostics import timed
+
+# Result of simulate_scenarios:
+#   forecasts: (n_scenarios, steps, n_vars) point forecasts,
+#   draws: (n_scenarios, n_draws, steps, n_vars) Monte Carlo paths, or None without draws,
+#   quantiles: (len(quantile_levels), n_scenarios, steps, n_vars) over the draws, or None,
+#   index: forecast DatetimeIndex, columns: variable names, scenarios: the adjustment dicts.
+ScenarioSweep = namedtuple("ScenarioSweep",
+                           ["forecasts", "draws", "quantiles", "quantile_levels", "index", "columns", "scenarios"])
 
 def convert_temperature_to_fahrenheit(data):
     """
     Converts temperature columns (containing "Temp" and "degC") from Celsius to Fahrenheit.
     F = C * 1.8 + 32.
     Renames the column to indicate degF.
+    Frames without such columns are returned as is, without a copy.
     """
+    temp_cols = [col for col in data.columns if "temp" in col.lower() and "degc" in col.lower()]
+    if not temp_cols:
+        return data
     data = data.copy()
-    for col in data.columns:
-        if "temp" in col.lower() and "degc" in col.lower():
-            data[col] = data[col] * 1.8 + 32
-            new_col = col.replace("degC", "degF").replace("DEGC", "degF")
-            data.rename(columns={col: new_col}, inplace=True)
-    return data
+    for col in temp_cols:
+        data[col] = data[col] * 1.8 + 32
+    return data.rename(columns={col: col.replace("degC", "degF").replace("DEGC", "degF") for col in temp_cols})
+
+@timed("var.select_order")
+def _select_lag(model, maxlags, n_obs):
+    """Returns the AIC-selected lag order, reducing maxlags if there are too few observations."""
+    if n_obs <= maxlags:
+        maxlags = max(1, n_obs - 1)
+    lag_order_results = model.select_order(maxlags)
+    return lag_order_results.aic if lag_order_results.aic is not None else 1
+
+def _fit_var(data_indexed, maxlags, lag=None, differenced=None):
+    """
+    Fits a VAR on the converted, DateTime-indexed frame.
+    lag / differenced: reuse a previously selected lag order and level/differenced choice;
+    when omitted the lag is selected by AIC and the level model is tried first.
+    Returns (results, lag, differenced).
+    """
+    # statsmodels is imported on first fit so that importing this module stays cheap.
+    from statsmodels.tsa.api import VAR
+    if not differenced:
+        try:
+            model = VAR(data_indexed)
+            level_lag = lag if lag is not None else _select_lag(model, maxlags, len(data_indexed))
+            return model.fit(level_lag), level_lag, False
+        except np.linalg.LinAlgError:
+            if differenced is False:
+                # The reused level model became singular: select the lag again on differences.
+                lag = None
+    # Try differencing the data.
+    data_diff = data_indexed.diff().dropna()
+    model = VAR(data_diff)
+    if lag is None:
+        lag = _select_lag(model, maxlags, len(data_diff))
+    return model.fit(lag), lag, True
 
-def train_var_model(data, maxlags=3):
+def _fingerprint(row_hashes, columns, maxlags):
+    """Returns the registry fingerprint of a training frame from its row hashes, columns and maxlags."""
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(repr((columns, maxlags)).encode())
+    return digest.hexdigest()[:32]
+
+@timed("var.train")
+def train_var_model(data, maxlags=3, registry=None, location=None):
     """
     Trains a VAR model on the given DataFrame.
     Converts temperature to Fahrenheit.
     If the number of observations is too small, automatically reduces maxlags.
     If a LinAlgError occurs (due to near-singular covariance), differences the data.
+    registry / location: optional VARRegistry (see var_registry.py) and the location the data belongs to.
+    With a registry, a model fitted on identical data is returned without refitting, and when only
+    new rows were appended since a stored fit the model is refitted reusing that fit's lag order
+    and level/differenced choice, skipping lag selection.
     
     Returns:
       - results: the fitted VAR model,
@@ -31,29 +89,45 @@ def train_var_model(data, maxlags=3):
     # Convert temperature columns to Fahrenheit.
     data_converted = convert_temperature_to_fahrenheit(data)
     data_indexed = data_converted.set_index("DateTime")
-    n_obs = len(data_indexed)
-    # Adjust maxlags if necessary.
-    if n_obs <= maxlags:
-        maxlags = max(1, n_obs - 1)
+    if registry is None or location is None:
+        results, _, differenced = _fit_var(data_indexed, maxlags)
+        return results, (data_indexed.iloc[-1] if differenced else None)
     
-    try:
-        model = VAR(data_indexed)
-        lag_order_results = model.select_order(maxlags)
-        lag = lag_order_results.aic if lag_order_results.aic is not None else 1
-        results = model.fit(lag)
-        return results, None  # Level model used.
-    except np.linalg.LinAlgError as err:
-        # Try differencing the data.
-        data_diff = data_indexed.diff().dropna()
-        if len(data_diff) <= maxlags:
-            maxlags = max(1, len(data_diff) - 1)
-        model = VAR(data_diff)
-        lag_order_results = model.select_order(maxlags)
-        lag = lag_order_results.aic if lag_order_results.aic is not None else 1
-        results = model.fit(lag)
-        last_level = data_indexed.iloc[-1]
-        return results, last_level
+    # Row hashes are independent of each other, so the hash of a prefix tells whether rows were only appended.
+    row_hashes = pd.util.hash_pandas_object(data_indexed, index=True).values
+    columns = list(data_indexed.columns)
+    fingerprint = _fingerprint(row_hashes, columns, maxlags)
+    entry = registry.get(location, fingerprint)
+    if entry is not None:
+        return entry["results"], entry["last_level"]
+    lag = differenced = None
+    # Reuse the lag order and level/differenced choice of the longest stored fit on a prefix of the data.
+    for n_rows, stored in sorted(registry.keys(location), reverse=True):
+        if n_rows < len(row_hashes) and _fingerprint(row_hashes[:n_rows], columns, maxlags) == stored:
+            entry = registry.get(location, stored)
+            if entry is not None:
+                lag, differenced = entry["lag"], entry["differenced"]
+                break
+    
+    results, lag, differenced = _fit_var(data_indexed, maxlags, lag, differenced)
+    last_level = data_indexed.iloc[-1] if differenced else None
+    registry.put(location, {
+        "fingerprint": fingerprint,
+        "n_rows": len(data_indexed),
+        "columns": columns,
+        "maxlags": maxlags,
+        "lag": lag,
+        "differenced": differenced,
+        "results": results,
+        "last_level": last_level,
+    })
+    return results, last_level
 
+def _converted_tail(data, rows):
+    """Returns the last rows of data converted to Fahrenheit and indexed by DateTime."""
+    return convert_temperature_to_fahrenheit(data.iloc[-rows:]).set_index("DateTime")
+
+@timed("var.simulate")
 def simulate_scenario(data, var_results, adjustments, steps=24, last_level=None):
     """
     Simulates a scenario given:
@@ -65,8 +139,8 @@ def simulate_scenario(data, var_results, adjustments, steps=24, last_level=None)
       
     Returns a forecast DataFrame.
     """
-    data_converted = convert_temperature_to_fahrenheit(data)
-    data_indexed = data_converted.set_index("DateTime")
+    # Only the last k_ar (+1 for differencing) rows enter the forecast, so only those are converted.
+    data_indexed = _converted_tail(data, var_results.k_ar + 1)
     
     if last_level is None:
         # Level model: use last k_ar observations.
@@ -98,5 +172,107 @@ def simulate_scenario(data, var_results, adjustments, steps=24, last_level=None)
         # Reconstruct level forecasts by cumulative sum.
         forecast_level = forecast_diff_df.cumsum() + last_level.values
         forecast_index = pd.date_range(start=data["DateTime"].iloc[-1], periods=steps+1, freq='H')[1:]
-        forecast_df = pd.DataFrame(forecast_level, index=forecast_index, columns=data_indexed.columns)
+        forecast_df = pd.DataFrame(forecast_level.to_numpy(), index=forecast_index, columns=data_indexed.columns)
         return forecast_df
+
+def scenario_grid(axes):
+    """
+    Builds the cross product of per-variable adjustments.
+    axes: dict mapping a variable to the adjustments to try,
+      e.g. {"RainForest_MountainTower_Temp": np.arange(-5, 5.5, 0.5), "RainForest_MountainTower_WindSpeed": [-1, 0, 1]}.
+    Returns a list of adjustment dicts, one per combination.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+def _trend_terms(var_results, steps):
+    """Returns the (steps, n_vars) contribution of the constant/trend terms, as VARResults.forecast computes it."""
+    k = var_results.neqs
+    if var_results.coefs_exog.size == 0:
+        return np.zeros((steps, k))
+    exogs = []
+    if var_results.trend.startswith("c"):
+        exogs.append(np.ones(steps))
+    lin_trend = np.arange(var_results.n_totobs + 1, var_results.n_totobs + 1 + steps)
+    if "t" in var_results.trend:
+        exogs.append(lin_trend)
+    if "tt" in var_results.trend:
+        exogs.append(lin_trend ** 2)
+    return np.column_stack(exogs) @ var_results.coefs_exog.T
+
+def _propagate(history, coefs, trend, shocks=None):
+    """
+    Runs the VAR recursion for many initial states at once.
+    history: (n, k_ar, n_vars) last observations, oldest first; coefs: (k_ar, n_vars, n_vars);
+    trend: (steps, n_vars); shocks: optional (n, steps, n_vars) innovations.
+    Returns (n, steps, n_vars) forecasts.
+    """
+    n, p, k = history.shape
+    steps = trend.shape[0]
+    window = history[:, ::-1, :].copy()  # window[:, i] is the observation i + 1 periods back.
+    out = np.empty((n, steps, k))
+    for h in range(steps):
+        step = trend[h] + np.einsum("npk,pjk->nj", window, coefs)
+        if shocks is not None:
+            step += shocks[:, h]
+        out[:, h] = step
+        window = np.concatenate([step[:, None, :], window[:, :-1]], axis=1)
+    return out
+
+@timed("var.simulate_sweep")
+def simulate_scenarios(data, var_results, scenarios, steps=24, last_level=None, n_draws=0, seed=None,
+                       quantile_levels=(0.05, 0.5, 0.95)):
+    """
+    Vectorized version of simulate_scenario for many adjustment scenarios.
+    All scenarios (and Monte Carlo draws) are propagated together through the fitted coefficient
+    matrices with NumPy array operations instead of one var_results.forecast call per scenario.
+      - data, var_results, steps, last_level: as for simulate_scenario.
+      - scenarios: list of adjustment dicts (see scenario_grid).
+      - n_draws: number of Monte Carlo paths per scenario, with innovations drawn from the
+        residual covariance of the VAR (sigma_u); 0 gives point forecasts only.
+      - seed: seed for the noise draws.
+      - quantile_levels: quantiles of the draws to summarize.
+    Returns a ScenarioSweep. Point forecasts match simulate_scenario for each scenario.
+    """
+    data_indexed = _converted_tail(data, var_results.k_ar + 1)
+    columns = list(data_indexed.columns)
+    k_ar = var_results.k_ar
+    
+    adjust = np.zeros((len(scenarios), len(columns)))
+    for i, adjustments in enumerate(scenarios):
+        for var, change in adjustments.items():
+            if var in columns:
+                adjust[i, columns.index(var)] += change
+    
+    if last_level is None:
+        # Level model: shift the last observation of each scenario's history.
+        base = data_indexed.iloc[-k_ar:].to_numpy(dtype=float)
+    else:
+        # Differenced model: the level adjustment becomes a shift of the last difference.
+        base = data_indexed.diff().dropna().iloc[-k_ar:].to_numpy(dtype=float)
+        adjust = (last_level.to_numpy(dtype=float) + adjust) - data_indexed.iloc[-1].to_numpy(dtype=float)
+    history = np.repeat(base[None], len(scenarios), axis=0)
+    history[:, -1] += adjust
+    
+    coefs = np.asarray(var_results.coefs)
+    trend = _trend_terms(var_results, steps)
+    forecasts = _propagate(history, coefs, trend)
+    
+    draws = quantiles = None
+    if n_draws:
+        rng = np.random.default_rng(seed)
+        chol = np.linalg.cholesky(np.asarray(var_results.sigma_u, dtype=float))
+        noise = rng.standard_normal((len(scenarios) * n_draws, steps, len(columns))) @ chol.T
+        draws = _propagate(np.repeat(history, n_draws, axis=0), coefs, trend, noise)
+        draws = draws.reshape(len(scenarios), n_draws, steps, len(columns))
+    
+    if last_level is not None:
+        # Reconstruct levels from the forecast differences.
+        forecasts = forecasts.cumsum(axis=1) + last_level.to_numpy(dtype=float)
+        if draws is not None:
+            draws = draws.cumsum(axis=2) + last_level.to_numpy(dtype=float)
+    if draws is not None:
+        quantiles = np.quantile(draws, quantile_levels, axis=1)
+    
+    index = pd.date_range(start=data["DateTime"].iloc[-1], periods=steps+1, freq='H')[1:]
+    return ScenarioSweep(forecasts, draws, quantiles, tuple(quantile_levels), index, columns, list(scenarios))
@@ -0,0 +1,135 @@
+# storage.py
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = "merged_store"
+PARTITION_FILE = "data.parquet"
+MANIFEST_FILE = "_manifest.json"
+FILE_CACHE_DIR = "_files"
+
+def location_path(store_dir, location):
+    """
+    Returns the Parquet file holding one location's merged data.
+    Partitions follow the Hive layout: <store_dir>/Location=<location>/data.parquet.
+    """
+    return os.path.join(store_dir, f"Location={location}", PARTITION_FILE)
+
+def write_location(store_dir, location, df):
+    """
+    Writes one location's merged DataFrame to its partition.
+    The Location column is implied by the partition and is not stored.
+    The file is written to a temporary name first so readers never see a partial partition.
+    """
+    path = location_path(store_dir, location)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.drop(columns=["Location"], errors="ignore").to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def write_store(merged_by_location, store_dir=DEFAULT_STORE_DIR):
+    """
+    Writes a {location: DataFrame} mapping to the store, one partition per location.
+    Returns the list of written file paths.
+    """
+    return [write_location(store_dir, loc, df) for loc, df in merged_by_location.items()]
+
+def list_locations(store_dir=DEFAULT_STORE_DIR):
+    """Returns the sorted list of locations that have a partition in the store."""
+    if not os.path.isdir(store_dir):
+        return []
+    locations = []
+    for name in os.listdir(store_dir):
+        if name.startswith("Location=") and os.path.exists(os.path.join(store_dir, name, PARTITION_FILE)):
+            locations.append(name[len("Location="):])
+    return sorted(locations)
+
+def list_columns(store_dir, location):
+    """
+    Returns the sensor columns stored for a location.
+    Only the Parquet footer is read, not the data.
+    """
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(location_path(store_dir, location))
+    return [name for name in schema.names if name != "DateTime"]
+
+def read_location(store_dir, location, columns=None):
+    """
+    Reads one location's partition.
+    columns: optional list of sensor columns to read; DateTime is always included.
+    Returns a DataFrame with DateTime, a categorical Location and the requested sensor columns.
+    """
+    if columns is not None:
+        columns = ["DateTime"] + [col for col in columns if col != "DateTime"]
+    df = pd.read_parquet(location_path(store_dir, location), columns=columns)
+    df.insert(1, "Location", pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[location]))
+    return df
+
+def remove_location(store_dir, location):
+    """Deletes a location's partition, e.g. when all of its source files were removed."""
+    shutil.rmtree(os.path.dirname(location_path(store_dir, location)), ignore_errors=True)
+
+def _read_manifest(store_dir):
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def load_manifest(store_dir=DEFAULT_STORE_DIR):
+    """
+    Loads the manifest of processed source files.
+    Returns a dict mapping file names to {"path", "size", "mtime", "sha256", "location"},
+    or an empty dict if the store has not been built yet.
+    """
+    return _read_manifest(store_dir).get("files", {})
+
+def load_manifest_settings(store_dir=DEFAULT_STORE_DIR):
+    """Returns the merge settings (e.g. time grid) the store was built with, or None."""
+    return _read_manifest(store_dir).get("settings")
+
+def save_manifest(store_dir, manifest, settings=None):
+    """
+    Writes the manifest of processed source files atomically.
+    settings: JSON-serializable merge settings the partitions were built with.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"files": manifest, "settings": settings}, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def file_cache_path(store_dir, sha256):
+    """
+    Returns the path of the cached parsed frame for a source file with the given content hash.
+    Caching parsed files lets a location be re-merged without re-reading its unchanged CSVs.
+    """
+    return os.path.join(store_dir, FILE_CACHE_DIR, f"{sha256}.parquet")
+
+def write_file_cache(store_dir, sha256, df):
+    """Writes a parsed source file frame to the file cache."""
+    path = file_cache_path(store_dir, sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return path
+
+def read_file_cache(store_dir, sha256):
+    """Reads a parsed source file frame from the file cache."""
+    return pd.read_parquet(file_cache_path(store_dir, sha256))
+
+def list_file_cache(store_dir):
+    """Returns the content hashes of all cached parsed frames."""
+    cache_dir = os.path.join(store_dir, FILE_CACHE_DIR)
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(name[:-len(".parquet")] for name in os.listdir(cache_dir) if name.endswith(".parquet"))
+
+def remove_file_cache(store_dir, sha256):
+    """Deletes a cached parsed frame that no source file refers to any more."""
+    path = file_cache_path(store_dir, sha256)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,205 @@
+# streaming.py
+import io
+import os
+import glob
+import threading
+import importlib
+
+import numpy as np
+import pandas as pd
+
+data_processing = importlib.import_module("data-processing")
+
+DEFAULT_CAPACITY = 20000
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of (timestamp, value) samples backed by NumPy arrays;
+    once full, the oldest samples are overwritten.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._times = np.empty(capacity, dtype="datetime64[ns]")
+        self._values = np.empty(capacity, dtype=float)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, times, values):
+        """Appends samples, keeping the most recent `capacity` of them."""
+        times = np.asarray(times, dtype="datetime64[ns]")[-self.capacity:]
+        values = np.asarray(values, dtype=float)[-self.capacity:]
+        positions = (self._next + np.arange(len(times))) % self.capacity
+        self._times[positions] = times
+        self._values[positions] = values
+        self._next = (self._next + len(times)) % self.capacity
+        self._size = min(self.capacity, self._size + len(times))
+
+    def series(self):
+        """Returns the buffered samples, oldest first, as a Series indexed by timestamp."""
+        order = (self._next - self._size + np.arange(self._size)) % self.capacity
+        return pd.Series(self._values[order], index=pd.DatetimeIndex(self._times[order], name="DateTime"))
+
+class FileTail:
+    """
+    Follows one raw sensor CSV file and returns the rows appended since the last read,
+    cleaned like load_csv_with_location (DateTime parsing, Location, unique column name, -9999 as NaN).
+    Incomplete trailing lines are left for the next read; a file that shrinks is read again from the start.
+    """
+
+    def __init__(self, file_path, from_start=True):
+        self.file_path = file_path
+        self.offset = 0
+        self.header = None
+        if not from_start:
+            self._read_header()
+            self.offset = os.path.getsize(file_path)
+
+    def _read_header(self):
+        with open(self.file_path, "rb") as f:
+            line = f.readline()
+        if line.endswith(b"\n"):
+            self.header = line.decode().rstrip("\r\n")
+            return len(line)
+        return None
+
+    def read(self):
+        """Returns the new rows as a DataFrame (DateTime, Location, unique column), or None if there are none."""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            # Truncated or replaced: start over.
+            self.offset, self.header = 0, None
+        if self.header is None:
+            header_end = self._read_header()
+            if header_end is None:
+                return None
+            self.offset = max(self.offset, header_end)
+        if size <= self.offset:
+            return None
+        with open(self.file_path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        complete = chunk.rfind(b"\n") + 1
+        if not complete:
+            return None
+        self.offset += complete
+        text = chunk[:complete].decode()
+        columns = pd.read_csv(io.StringIO(self.header), nrows=0).columns
+        df = pd.read_csv(io.StringIO(f"{self.header}\n{text}"), usecols=list(columns[:2]))
+        if df.empty:
+            return None
+        df[df.columns[1]] = pd.to_numeric(df[df.columns[1]], errors="coerce")
+        return data_processing.clean_sensor_frame(df, self.file_path)
+
+class StreamIngestor:
+    """
+    Streaming ingest: polls watch directories for raw sensor CSV files, tails the rows appended
+    to them (see FileTail) and pushes the readings into per-location, per-column ring buffers.
+    from_start: read files already present from the beginning; otherwise only rows appended
+    after the ingestor started are buffered (files created later are always read in full).
+    version increases whenever new readings arrive, so readers can tell when to refresh.
+    """
+
+    def __init__(self, watch_dirs=("data",), capacity=DEFAULT_CAPACITY, freq=data_processing.DEFAULT_FREQ,
+                 from_start=False, poll_interval=2.0):
+        self.watch_dirs = [watch_dirs] if isinstance(watch_dirs, str) else list(watch_dirs)
+        self.capacity = capacity
+        self.freq = freq
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.last_update = None
+        self._tails = {}
+        self._stats = {}
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for file_path in self._csv_files():
+            self._tails[file_path] = FileTail(file_path, from_start=from_start)
+
+    def _csv_files(self):
+        files = []
+        for directory in self.watch_dirs:
+            files.extend(sorted(glob.glob(os.path.join(directory, "*.csv"))))
+        return files
+
+    def poll(self):
+        """Reads new rows from every watched file once. Returns the number of readings buffered."""
+        added = 0
+        for file_path in self._csv_files():
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            if self._stats.get(file_path) == (stat.st_size, stat.st_mtime):
+                continue
+            tail = self._tails.setdefault(file_path, FileTail(file_path))
+            try:
+                df = tail.read()
+            except Exception as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+            self._stats[file_path] = (stat.st_size, stat.st_mtime)
+            if df is None:
+                continue
+            location, column = df["Location"].iloc[0], df.columns[-1]
+            df = df.dropna(subset=["DateTime", column])
+            if df.empty:
+                continue
+            with self._lock:
+                buffers = self._buffers.setdefault(location, {})
+                buffer = buffers.setdefault(column, RingBuffer(self.capacity))
+                buffer.extend(df["DateTime"].to_numpy(), df[column].to_numpy())
+                # Updated with the buffers so readers never see readings without a last_update.
+                self.version += 1
+                self.last_update = pd.Timestamp.now()
+            added += len(df)
+        return added
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Starts polling on a daemon thread every poll_interval seconds."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stream-ingest", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the polling thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def locations(self):
+        """Returns the locations with buffered readings."""
+        with self._lock:
+            return sorted(self._buffers)
+
+    def columns(self, location):
+        """Returns the buffered sensor columns of a location."""
+        with self._lock:
+            return sorted(self._buffers.get(location, {}))
+
+    def frame(self, location, columns=None):
+        """
+        Returns the buffered readings of a location as a frame like the merged store's
+        (DateTime, Location, sensor columns), snapped onto the freq grid by averaging.
+        """
+        with self._lock:
+            buffers = self._buffers.get(location, {})
+            series = {col: buffer.series() for col, buffer in buffers.items()
+                      if columns is None or col in columns}
+        if not series:
+            return pd.DataFrame(columns=["DateTime", "Location"])
+        aligned = {col: s.groupby(s.index.floor(self.freq)).mean() for col, s in series.items()}
+        df = pd.DataFrame(aligned).sort_index().rename_axis("DateTime").reset_index()
+        df.insert(1, "Location", location)
+        return df
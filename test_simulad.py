@@ -0,0 +1,126 @@
+# test_simulad.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import ai_integration
+from correlation import CorrelationEngine
+from llm_cache import ResponseCache
+from ollama_client import OllamaClient
+from ollama_stub import StubOllamaServer
+from simulation import (_fit_var, convert_temperature_to_fahrenheit, scenario_grid, simulate_scenario,
+                        simulate_scenarios, train_var_model)
+
+SIMULATION_TEXT = "Temperature +0.5 degC raises CO2 by 3 ppm over 24 hours."
+
+def sensor_frame(n_rows=400, seed=0):
+    """Returns an hourly frame of three coupled synthetic sensors following a stable VAR(1)."""
+    rng = np.random.default_rng(seed)
+    coefs = np.array([[0.6, 0.1, 0.0], [-0.2, 0.5, 0.1], [0.1, 0.0, 0.7]])
+    values = np.zeros((n_rows, 3))
+    for t in range(1, n_rows):
+        values[t] = coefs @ values[t - 1] + rng.standard_normal(3)
+    return pd.DataFrame({
+        "DateTime": pd.date_range("2024-01-01", periods=n_rows, freq="H"),
+        "Site_Temp_degC": 20 + values[:, 0],
+        "Site_RH_%": 60 + 5 * values[:, 1],
+        "Site_LICOR_CO2": 410 + 2 * values[:, 2],
+    })
+
+@pytest.fixture
+def llm(monkeypatch, tmp_path):
+    """Points ai_integration at a running stub server and a fresh response cache."""
+    with StubOllamaServer() as server:
+        cache = ResponseCache(str(tmp_path / "llm_responses.sqlite"))
+        monkeypatch.setattr(ai_integration, "_client", OllamaClient(server.url, retries=0))
+        monkeypatch.setattr(ai_integration, "_response_cache", cache)
+        monkeypatch.setattr(ai_integration, "LLM_BACKEND", "http")
+        yield server, cache
+
+def expected_reply(model="phi3"):
+    prompt = ai_integration.build_summary_prompt(SIMULATION_TEXT)
+    return f"[{model}] Stub analysis of {len(prompt)} prompt characters: conditions are stable."
+
+def test_generate_summary_uses_stub_server(llm):
+    server, _ = llm
+    assert ai_integration.generate_summary(SIMULATION_TEXT) == expected_reply()
+    assert len(server.requests) == 1
+    assert server.requests[0]["stream"] is False
+    assert server.requests[0]["prompt"] == ai_integration.build_summary_prompt(SIMULATION_TEXT)
+
+def test_stream_summary_yields_chunks(llm):
+    server, _ = llm
+    chunks = list(ai_integration.stream_summary(SIMULATION_TEXT))
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == expected_reply()
+    assert server.requests[0]["stream"] is True
+
+def test_summaries_are_served_from_cache(llm):
+    server, cache = llm
+    first = ai_integration.generate_summary(SIMULATION_TEXT)
+    assert ai_integration.generate_summary(SIMULATION_TEXT) == first
+    # The streamed summary shares the cache entry and arrives in one chunk.
+    assert list(ai_integration.stream_summary(SIMULATION_TEXT)) == [first]
+    assert len(server.requests) == 1
+    assert cache.hits == 2
+    # Prompts differing only in whitespace share an entry.
+    assert ai_integration.generate_summary(SIMULATION_TEXT.replace(" ", "  ")) == first
+    assert len(server.requests) == 1
+    # Other models and use_cache=False query the server.
+    assert ai_integration.generate_summary(SIMULATION_TEXT, model="llama3") == expected_reply("llama3")
+    ai_integration.generate_summary(SIMULATION_TEXT, use_cache=False)
+    assert len(server.requests) == 3
+
+def test_errors_are_returned_as_text_and_not_cached(monkeypatch, tmp_path):
+    with StubOllamaServer() as server:
+        url = server.url
+    # The server is closed: connections to its URL are refused.
+    cache = ResponseCache(str(tmp_path / "llm_responses.sqlite"))
+    monkeypatch.setattr(ai_integration, "_client", OllamaClient(url, timeout=(1, 1), retries=0))
+    monkeypatch.setattr(ai_integration, "_response_cache", cache)
+    monkeypatch.setattr(ai_integration, "LLM_BACKEND", "http")
+
+    assert ai_integration.generate_summary(SIMULATION_TEXT).startswith("Error generating summary")
+    chunks = list(ai_integration.stream_summary(SIMULATION_TEXT))
+    assert len(chunks) == 1 and chunks[0].startswith("Error generating summary")
+    prompt = ai_integration.build_summary_prompt(SIMULATION_TEXT)
+    assert cache.get("phi3", prompt) is None
+
+def assert_sweep_matches_scenarios(data, results, last_level):
+    scenarios = scenario_grid({"Site_Temp_degF": [-1.0, 0.0, 2.0], "Site_LICOR_CO2": [0.0, 5.0]})
+    sweep = simulate_scenarios(data, results, scenarios, steps=24, last_level=last_level)
+    assert sweep.forecasts.shape == (len(scenarios), 24, 3)
+    for forecast, adjustments in zip(sweep.forecasts, scenarios):
+        expected = simulate_scenario(data, results, adjustments, steps=24, last_level=last_level)
+        assert list(expected.columns) == sweep.columns
+        assert (expected.index == sweep.index).all()
+        np.testing.assert_allclose(forecast, expected.to_numpy(), rtol=0, atol=1e-9)
+
+def test_simulate_scenarios_matches_simulate_scenario():
+    data = sensor_frame()
+    results, last_level = train_var_model(data)
+    assert last_level is None
+    assert_sweep_matches_scenarios(data, results, last_level)
+
+def test_simulate_scenarios_matches_simulate_scenario_differenced():
+    data = sensor_frame()
+    data_indexed = convert_temperature_to_fahrenheit(data).set_index("DateTime")
+    results, _, differenced = _fit_var(data_indexed, 3, differenced=True)
+    assert differenced
+    assert_sweep_matches_scenarios(data, results, data_indexed.iloc[-1])
+
+def test_correlation_engine_matches_dataframe_corr():
+    df = sensor_frame(n_rows=24 * 10)
+    rng = np.random.default_rng(1)
+    columns = ["Site_Temp_degC", "Site_RH_%", "Site_LICOR_CO2"]
+    for col in columns:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    # Rows arrive in two batches, the second one extending a partially filled chunk.
+    engine = CorrelationEngine(df.iloc[:100], columns)
+    engine.add(df.iloc[100:])
+
+    np.testing.assert_allclose(engine.corr().to_numpy(), df[columns].corr().to_numpy(), rtol=0, atol=1e-9)
+    start, end = df["DateTime"].iloc[30], df["DateTime"].iloc[170]
+    window = df[(df["DateTime"] >= start) & (df["DateTime"] <= end)]
+    np.testing.assert_allclose(engine.corr(start, end).to_numpy(), window[columns].corr().to_numpy(),
+                               rtol=0, atol=1e-9)
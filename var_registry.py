@@ -0,0 +1,113 @@
+# var_registry.py
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_REGISTRY_DIR = os.path.join(".simulad_cache", "var")
+DEFAULT_MAX_ENTRIES = 16
+
+class VARRegistry:
+    """
+    Persistent registry of fitted VAR models, keyed by location and training data fingerprint.
+    Each location keeps its max_entries most recently used fits, so alternating workloads
+    (backtest folds on growing prefixes, then a fit on the full data) do not evict each other.
+    An entry is a dict with:
+      - fingerprint / n_rows: hash and length of the (unit-converted) training frame,
+      - maxlags, lag: the lag search bound and the selected lag order,
+      - differenced: whether the model had to be fitted on differenced data,
+      - results: the fitted VARResults, last_level: the last level observation (differenced models only).
+    Entries live in memory and are pickled to registry_dir/<location hash>/<n_rows>_<fingerprint>.pkl
+    so they survive restarts and are shared by worker processes.
+    Set registry_dir to None for a memory-only registry.
+    """
+
+    def __init__(self, registry_dir=DEFAULT_REGISTRY_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        self.registry_dir = registry_dir
+        self.max_entries = max_entries
+        self._entries = {}  # location -> OrderedDict(fingerprint -> entry), least recently used first
+        self._lock = threading.Lock()
+        if registry_dir:
+            os.makedirs(registry_dir, exist_ok=True)
+
+    def _dir(self, location):
+        name = hashlib.sha256(str(location).encode()).hexdigest()[:32]
+        return os.path.join(self.registry_dir, name)
+
+    def _disk_keys(self, location):
+        """Returns (n_rows, fingerprint, path) of the stored entries of a location, least recently used first."""
+        directory = self._dir(location)
+        if not os.path.isdir(directory):
+            return []
+        keys = []
+        for name in os.listdir(directory):
+            if not name.endswith(".pkl"):
+                continue
+            n_rows, _, fingerprint = name[:-len(".pkl")].partition("_")
+            path = os.path.join(directory, name)
+            try:
+                keys.append((os.path.getmtime(path), int(n_rows), fingerprint, path))
+            except (OSError, ValueError):
+                continue
+        return [key[1:] for key in sorted(keys)]
+
+    def keys(self, location):
+        """Returns (n_rows, fingerprint) of every entry of a location, most recently used first."""
+        with self._lock:
+            keys = {fp: entry["n_rows"] for fp, entry in self._entries.get(location, {}).items()}
+            if self.registry_dir:
+                for n_rows, fingerprint, _ in self._disk_keys(location):
+                    keys.setdefault(fingerprint, n_rows)
+            memory = list(self._entries.get(location, {}))
+            ordered = memory[::-1] + [fp for fp in keys if fp not in memory]
+            return [(keys[fp], fp) for fp in ordered]
+
+    def get(self, location, fingerprint):
+        """Returns the entry fitted on the data with this fingerprint, or None."""
+        with self._lock:
+            entries = self._entries.setdefault(location, OrderedDict())
+            if fingerprint in entries:
+                entries.move_to_end(fingerprint)
+                return entries[fingerprint]
+            if not self.registry_dir:
+                return None
+            for _, stored, path in self._disk_keys(location):
+                if stored != fingerprint:
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        entry = pickle.load(f)
+                    os.utime(path)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    return None
+                self._remember(location, entry)
+                return entry
+            return None
+
+    def _remember(self, location, entry):
+        entries = self._entries.setdefault(location, OrderedDict())
+        entries[entry["fingerprint"]] = entry
+        entries.move_to_end(entry["fingerprint"])
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def put(self, location, entry):
+        """Stores an entry under its fingerprint, evicting the location's least recently used entries."""
+        with self._lock:
+            self._remember(location, entry)
+            if not self.registry_dir:
+                return
+            directory = self._dir(location)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{entry['n_rows']}_{entry['fingerprint']}.pkl")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            stored = self._disk_keys(location)
+            for _, _, old_path in stored[:max(0, len(stored) - self.max_entries)]:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass